@@ -22,14 +22,22 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "invoice.routers.ReadReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "invoice.instrumentation.SQLProfilingMiddleware",
 ]
 
+# Per-request SQL/latency recording, shown at /admin/invoice/profiling/.
+# When disabled the middleware removes itself at startup.
+SQL_PROFILING_ENABLED = os.environ.get("SQL_PROFILING_ENABLED", "False") == "True"
+SQL_PROFILING_BUFFER_SIZE = int(os.environ.get("SQL_PROFILING_BUFFER_SIZE", "200"))
+SQL_PROFILING_SLOWEST = int(os.environ.get("SQL_PROFILING_SLOWEST", "5"))
+
 ROOT_URLCONF = "cm_invoice_tracking.urls"
 
 TEMPLATES = [
@@ -50,10 +58,27 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "cm_invoice_tracking.wsgi.application"
 
+# Applied to every new SQLite connection by invoice.signals.configure_sqlite.
+# WAL lets readers run alongside a writer; busy_timeout makes writers queue
+# for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", "10000")),
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-32000")),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        "OPTIONS": {"timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000},
+        # A file rather than SQLite's in-memory test database, so the concurrency
+        # test runs under WAL and busy_timeout as production does.
+        "TEST": {"NAME": str(BASE_DIR / "test_db.sqlite3")},
     }
 }
 
@@ -65,11 +90,73 @@ if os.environ.get("DB_ENGINE") == "sqlserver":
         "PASSWORD": os.environ.get("DB_PASSWORD", ""),
         "HOST": os.environ.get("DB_HOST", ""),
         "PORT": os.environ.get("DB_PORT", ""),
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
         "OPTIONS": {
             "driver": os.environ.get("DB_DRIVER", "ODBC Driver 17 for SQL Server"),
         },
     }
 
+# Optional read replica for the overview, changelists and exports, routed by
+# invoice.routers. Locally DB_REPLICA_NAME can point at a second SQLite file;
+# with SQL Server set DB_REPLICA_HOST (and DB_REPLICA_NAME if it differs).
+if os.environ.get("DB_REPLICA_NAME") or os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = dict(
+        DATABASES["default"],
+        NAME=os.environ.get("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        HOST=os.environ.get("DB_REPLICA_HOST", DATABASES["default"].get("HOST", "")),
+        TEST={"MIRROR": "default"},
+    )
+
+DATABASE_ROUTERS = ["invoice.routers.ReadReplicaRouter"]
+READ_DATABASE_ALIAS = os.environ.get(
+    "DB_READ_ALIAS", "replica" if "replica" in DATABASES else "default"
+)
+# How long a user keeps reading from the primary after they write.
+READ_REPLICA_PIN_SECONDS = int(os.environ.get("READ_REPLICA_PIN_SECONDS", "10"))
+
+# When a CustomerStepRule changes, OPEN steps of the current and future
+# periods are re-planned; dates edited by hand are kept unless this is False.
+REPLAN_PROTECT_OVERRIDDEN_DATES = (
+    os.environ.get("REPLAN_PROTECT_OVERRIDDEN_DATES", "True") == "True"
+)
+
+# Closed works older than this many months are moved to the archive tables
+# by the archive_works command.
+ARCHIVE_AFTER_MONTHS = int(os.environ.get("ARCHIVE_AFTER_MONTHS", "24"))
+
+DASHBOARD_CACHE_ALIAS = "dashboard"
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get("DASHBOARD_CACHE_TIMEOUT", "300"))
+
+# The overview cache's version counters are bumped by web workers, management
+# commands and the generation worker alike, so the default backend must be
+# shared between processes. "locmem" is only safe for a single process and is
+# rejected by `manage.py check` when WEB_CONCURRENCY > 1.
+DASHBOARD_CACHE_BACKENDS = {
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+}
+DASHBOARD_CACHE_BACKEND = os.environ.get("DASHBOARD_CACHE_BACKEND", "file")
+DASHBOARD_CACHE_LOCATIONS = {
+    "file": str(BASE_DIR / "cache" / "dashboard"),
+    "db": "invoice_dashboard_cache",
+    "locmem": "invoice-dashboard",
+}
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    DASHBOARD_CACHE_ALIAS: {
+        "BACKEND": DASHBOARD_CACHE_BACKENDS[DASHBOARD_CACHE_BACKEND],
+        "LOCATION": os.environ.get(
+            "DASHBOARD_CACHE_LOCATION", DASHBOARD_CACHE_LOCATIONS[DASHBOARD_CACHE_BACKEND]
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -1,31 +1,59 @@
 from datetime import timedelta
+from functools import wraps
 import calendar
+import hashlib
+import time
 
 from django import forms
 from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import GroupAdmin, UserAdmin as DjangoUserAdmin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.models import Group
-from django.db.models import Q
-from django.http import HttpResponseForbidden
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Prefetch, Q
+from django.http import HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from django.urls import reverse
 from django.urls import path
 from django.utils import timezone
-
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from invoice import dashboard_cache
+from invoice import instrumentation
+from invoice import reporting
+from invoice import routers
+from invoice import search
+from invoice.exporters import export_response
+from invoice.importers import CLEAR_TOKEN, IMPORT_COLUMNS, ImportRowError, import_customers
+from invoice.models import ArchivedWork
+from invoice.models import ArchivedWorkStep
 from invoice.models import Customer
 from invoice.models import CustomerStepRule
+from invoice.models import GenerationJob
 from invoice.models import SystemSetting
 from invoice.models import STEP_LABELS
+from invoice.models import StepKpiRollup
 from invoice.models import User
 from invoice.models import Work
 from invoice.models import WorkStep
-from invoice.services import bulk_ensure_work_for_month
+from invoice.pagination import KeysetPaginationMixin
+from invoice.services import BN_ISSUE_STATUSES
+from invoice.services import delete_steps
+from invoice.services import enqueue_generation
+from invoice.services import propagate_lcm_scnx
+from invoice.services import reassign_open_works
+from invoice.services import restore_archived_works
+from invoice.services import set_step_status
 
 
 class WorkStepForm(forms.ModelForm):
     class Meta:
         model = WorkStep
-        fields = "__all__"
+        exclude = ("due_date_overridden",)
 
     def clean(self):
         cleaned_data = super().clean()
@@ -33,6 +61,21 @@ class WorkStepForm(forms.ModelForm):
             raise forms.ValidationError("planned_due_date is required.")
         return cleaned_data
 
+    def save(self, commit=True):
+        if "planned_due_date" in self.changed_data:
+            self.instance.due_date_overridden = True
+        return super().save(commit)
+
+
+class StepActionForm(ActionForm):
+    # Which step the Work list's close/reopen actions apply to.
+    step_no = forms.TypedChoiceField(
+        choices=[("", "All steps")] + WorkStep.STEP_CHOICES,
+        coerce=int,
+        empty_value=None,
+        required=False,
+    )
+
 
 class CustomerStepRuleInlineForm(forms.ModelForm):
     step_no = forms.ChoiceField(disabled=True, required=False, choices=CustomerStepRule.STEP_CHOICES)
@@ -64,6 +107,16 @@ class CustomerStepRuleInlineFormSet(forms.BaseInlineFormSet):
             form.fields["step_no"].label = STEP_LABELS.get(index, f"Step {index}")
 
 
+class CustomerImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV (UTF-8) or XLSX with a header row.")
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not upload.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("Upload a .csv or .xlsx file.")
+        return upload
+
+
 class WorkStepInline(admin.TabularInline):
     model = WorkStep
     form = WorkStepForm
@@ -73,6 +126,16 @@ class WorkStepInline(admin.TabularInline):
         return False
 
 
+class ArchivedWorkStepInline(admin.TabularInline):
+    model = ArchivedWorkStep
+    extra = 0
+    fields = ("step_no", "planned_due_date", "actual_closed_date", "step_status", "step_comment")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class CustomerStepRuleInline(admin.TabularInline):
     model = CustomerStepRule
     form = CustomerStepRuleInlineForm
@@ -88,6 +151,77 @@ class CustomerStepRuleInline(admin.TabularInline):
         return 0
 
 
+LCM_FIELDS = {"responsible_lcm", "assigned_lcm"}
+
+
+def is_autocomplete_request(request):
+    match = request.resolver_match
+    return match is not None and match.url_name == "autocomplete"
+
+
+def autocomplete_media(admin_site):
+    # The select2 assets the autocomplete_fields widgets load on change forms.
+    return AutocompleteSelect(Customer._meta.get_field("responsible_cm"), admin_site).media
+
+
+class PrefixAutocompleteMixin:
+    # Autocomplete lookups match prefixes only, which the search indexes from
+    # migration 0006 can serve; the changelist search box keeps substring search.
+    autocomplete_search_fields = ()
+
+    def get_search_fields(self, request):
+        if is_autocomplete_request(request):
+            return self.autocomplete_search_fields
+        return super().get_search_fields(request)
+
+
+class AutocompleteFilterSelect(AutocompleteSelect):
+    def __init__(self, field, admin_site, placeholder):
+        super().__init__(field, admin_site)
+        self.placeholder = placeholder
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)
+        attrs["data-placeholder"] = self.placeholder
+        return attrs
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    # Renders a select2 box fed by the admin autocomplete endpoint instead of
+    # listing every related object on each changelist load.
+    template = "admin/invoice/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def has_output(self):
+        return True
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def widget_id(self):
+        return "filter_{}".format(self.field_path)
+
+    def rendered_widget(self):
+        form_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteFilterSelect(self.field, self.admin_site, self.title),
+        )
+        return form_field.widget.render(
+            self.lookup_kwarg, self.lookup_val, attrs={"id": self.widget_id()}
+        )
+
+
+class ReplicaReadsMixin:
+    # Changelist GETs read from settings.READ_DATABASE_ALIAS (see invoice.routers).
+    def changelist_view(self, request, extra_context=None):
+        routers.use_replica_for(request)
+        return super().changelist_view(request, extra_context)
+
+
 class LcmScnxFilter(admin.SimpleListFilter):
     title = "LCM SCNx"
     parameter_name = "lcm_scnx"
@@ -110,10 +244,11 @@ class LcmScnxFilter(admin.SimpleListFilter):
         return queryset
 
 
-class UserAdmin(DjangoUserAdmin):
+class UserAdmin(PrefixAutocompleteMixin, DjangoUserAdmin):
     list_display = ("english_name", "role", "scnx")
     list_filter = ("english_name", "role", "scnx")
     search_fields = ("username", "english_name")
+    autocomplete_search_fields = ("^username", "^english_name")
     fieldsets = DjangoUserAdmin.fieldsets + (
         ("CM Invoice", {"fields": ("english_name", "role", "scnx")}),
     )
@@ -121,8 +256,26 @@ class UserAdmin(DjangoUserAdmin):
         ("CM Invoice", {"fields": ("english_name", "role", "scnx")}),
     )
 
-
-class CustomerAdmin(admin.ModelAdmin):
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        if is_autocomplete_request(request) and request.GET.get("field_name") in LCM_FIELDS:
+            queryset = queryset.filter(role=User.Role.LCM)
+        return queryset, may_have_duplicates
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "scnx" in form.changed_data:
+            touched, elapsed = propagate_lcm_scnx([obj.pk])
+            if touched:
+                messages.info(
+                    request,
+                    "Updated LCM SCNx on {} open works in {:.2f}s.".format(touched, elapsed),
+                )
+
+
+class CustomerAdmin(ReplicaReadsMixin, PrefixAutocompleteMixin, admin.ModelAdmin):
     class CustomerAdminForm(forms.ModelForm):
         class Meta:
             model = Customer
@@ -143,12 +296,92 @@ class CustomerAdmin(admin.ModelAdmin):
         "rules_summary",
     )
     list_display_links = ("customer_label",)
-    list_filter = ("ile", "region", "responsible_cm", "responsible_lcm", LcmScnxFilter)
+    list_filter = (
+        "ile",
+        "region",
+        ("responsible_cm", AutocompleteFilter),
+        ("responsible_lcm", AutocompleteFilter),
+        LcmScnxFilter,
+    )
     search_fields = ("ile", "round_location")
+    autocomplete_search_fields = ("^ile", "^round_location")
+    autocomplete_fields = ("responsible_cm", "responsible_lcm")
     readonly_fields = ("lcm_scnx",)
     fields = ("ile", "round_location", "region", "responsible_cm", "responsible_lcm", "lcm_scnx")
     inlines = [CustomerStepRuleInline]
     form = CustomerAdminForm
+    actions = ["reassign_open_works_action"]
+    change_list_template = "admin/invoice/customer/change_list.html"
+
+    @property
+    def media(self):
+        return super().media + autocomplete_media(self.admin_site)
+
+    def get_search_results(self, request, queryset, search_term):
+        if is_autocomplete_request(request) or not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        customers = search.matching_customers(search_term, queryset.db)
+        return queryset.filter(pk__in=customers.values("pk")), False
+
+    def get_ordering(self, request):
+        # Autocomplete pages walk the unique (ile, round_location) index.
+        if is_autocomplete_request(request):
+            return ("ile", "round_location")
+        return super().get_ordering(request)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="invoice_customer_import",
+            ),
+        ]
+        return custom_urls + urls
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = CustomerImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                result = import_customers(upload.file, upload.name)
+            except ImportRowError as exc:
+                form.add_error("file", str(exc))
+            else:
+                messages.success(
+                    request,
+                    "Imported {} rows: customers created {}, updated {}; "
+                    "rules created {}, updated {}.".format(
+                        result["rows"],
+                        result["customers_created"],
+                        result["customers_updated"],
+                        result["rules_created"],
+                        result["rules_updated"],
+                    ),
+                )
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title="Import customers",
+            form=form,
+            result=result,
+            import_columns=IMPORT_COLUMNS,
+            clear_token=CLEAR_TOKEN,
+        )
+        return TemplateResponse(request, "admin/invoice/customer/import.html", context)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.select_related("responsible_cm", "responsible_lcm").prefetch_related(
+            Prefetch(
+                "customersteprule_set",
+                queryset=CustomerStepRule.objects.order_by("step_no"),
+            )
+        )
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "responsible_cm":
@@ -172,7 +405,7 @@ class CustomerAdmin(admin.ModelAdmin):
     lcm_scnx.short_description = "LCM SCNx"
 
     def rules_summary(self, obj):
-        rules = CustomerStepRule.objects.filter(customer=obj).order_by("step_no")
+        rules = obj.customersteprule_set.all()
         weekday_map = list(calendar.day_abbr)
         parts = []
         for rule in rules:
@@ -195,8 +428,30 @@ class CustomerAdmin(admin.ModelAdmin):
 
     rules_summary.short_description = "Step Rules"
 
-class CustomerStepRuleAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {"region", "responsible_cm", "responsible_lcm"} & set(form.changed_data):
+            touched, elapsed = reassign_open_works([obj.pk])
+            if touched:
+                messages.info(
+                    request,
+                    "Reassigned {} open works in {:.2f}s.".format(touched, elapsed),
+                )
+
+    def reassign_open_works_action(self, request, queryset):
+        touched, elapsed = reassign_open_works(queryset)
+        self.message_user(
+            request,
+            "Reassigned {} open works in {:.2f}s.".format(touched, elapsed),
+            messages.SUCCESS,
+        )
+
+    reassign_open_works_action.short_description = "Sync CM/LCM to open works"
+
+class CustomerStepRuleAdmin(ReplicaReadsMixin, admin.ModelAdmin):
     list_display = ("customer", "step_no", "rule_type")
+    list_select_related = ("customer",)
+    autocomplete_fields = ("customer",)
 
     def has_view_permission(self, request, obj=None):
         return super().has_view_permission(request, obj=obj)
@@ -228,7 +483,7 @@ class CustomerStepRuleAdmin(admin.ModelAdmin):
             return True
         return False
 
-class WorkAdmin(admin.ModelAdmin):
+class WorkAdmin(ReplicaReadsMixin, KeysetPaginationMixin, admin.ModelAdmin):
     list_display = (
         "customer",
         "work_period",
@@ -239,16 +494,21 @@ class WorkAdmin(admin.ModelAdmin):
         "assigned_lcm_scnx",
     )
     list_filter = (
-        "customer",
+        ("customer", AutocompleteFilter),
         "work_year",
         "work_month",
         "customer_region",
-        "assigned_cm",
-        "assigned_lcm",
+        ("assigned_cm", AutocompleteFilter),
+        ("assigned_lcm", AutocompleteFilter),
         "assigned_lcm_scnx",
         "bn_release_status",
     )
+    list_select_related = ("customer", "assigned_cm", "assigned_lcm")
+    # Served by work_period_idx (and the CM/LCM period indexes), so keyset
+    # pages seek straight to their first row.
+    ordering = ("-work_year", "-work_month", "-pk")
     search_fields = ("customer__ile", "customer__round_location")
+    autocomplete_fields = ("customer",)
     inlines = [WorkStepInline]
     readonly_fields = (
         "customer_region",
@@ -264,10 +524,37 @@ class WorkAdmin(admin.ModelAdmin):
         "comment",
     ) + readonly_fields
 
+    actions = ["export_works_csv", "export_works_xlsx", "close_steps", "reopen_steps"]
+    action_form = StepActionForm
+    change_list_template = "admin/invoice/work/change_list.html"
+
+    @property
+    def media(self):
+        return super().media + autocomplete_media(self.admin_site)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "export/",
+                self.admin_site.admin_view(routers.replica_reads(self.export_view)),
+                name="invoice_work_export",
+            ),
+        ]
+        return custom_urls + urls
+
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         return visible_works_for_user(queryset, request.user)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Resolve the customers through the full-text index first, so the
+        # search never joins customer into a LIKE scan over every work.
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        customers = search.matching_customers(search_term, queryset.db)
+        return queryset.filter(customer__in=customers.values("pk")), False
+
     def has_delete_permission(self, request, obj=None):
         if request.user.is_superuser or request.user.role in [
             User.Role.HOD,
@@ -283,117 +570,514 @@ class WorkAdmin(admin.ModelAdmin):
 
     work_period.short_description = "Work Period"
 
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        # Apply the same filters and search as the changelist the link came from.
+        params = request.GET.copy()
+        export_format = params.pop("format", ["csv"])[0]
+        request.GET = params
+        queryset = self.get_changelist_instance(request).get_queryset(request)
+        # The rows stream after the view returns, so bind the replica explicitly.
+        return export_response(queryset.using(routers.reads_alias()), export_format)
+
+    def export_works_csv(self, request, queryset):
+        return export_response(queryset, "csv")
+
+    export_works_csv.short_description = "Export selected works (CSV)"
+
+    def export_works_xlsx(self, request, queryset):
+        return export_response(queryset, "xlsx")
+
+    export_works_xlsx.short_description = "Export selected works (XLSX)"
+
+    def _update_steps(self, request, queryset, step_status, verb):
+        form = self.action_form(request.POST, auto_id=None)
+        form.fields["action"].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            self.message_user(request, "Choose a valid step.", messages.ERROR)
+            return
+        step_no = form.cleaned_data["step_no"]
+        steps = WorkStep.objects.filter(work__in=queryset.values("pk"))
+        if step_no is not None:
+            steps = steps.filter(step_no=step_no)
+        started = time.perf_counter()
+        touched = set_step_status(steps, step_status)
+        self.message_user(
+            request,
+            "{} {} {} in {:.0f} ms.".format(
+                verb,
+                touched,
+                "step {} rows".format(step_no) if step_no else "steps",
+                (time.perf_counter() - started) * 1000,
+            ),
+            messages.SUCCESS,
+        )
+
+    def close_steps(self, request, queryset):
+        self._update_steps(request, queryset, WorkStep.StepStatus.CLOSED, "Closed")
+
+    close_steps.short_description = "Close the chosen step of selected works"
+    close_steps.allowed_permissions = ("change",)
+
+    def reopen_steps(self, request, queryset):
+        self._update_steps(request, queryset, WorkStep.StepStatus.OPEN, "Reopened")
+
+    reopen_steps.short_description = "Reopen the chosen step of selected works"
+    reopen_steps.allowed_permissions = ("change",)
+
+class WorkStepAdmin(ReplicaReadsMixin, KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ("work", "step_no", "step_status", "planned_due_date", "actual_closed_date")
+    list_filter = ("step_no", "step_status")
+    list_select_related = ("work__customer",)
+    ordering = ("-pk",)
+    autocomplete_fields = ("work",)
+    form = WorkStepForm
+    actions = ["close_selected_steps", "reopen_selected_steps"]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        work_ids = visible_work_ids(request.user)
+        if work_ids is not None:
+            queryset = queryset.filter(work__in=work_ids)
+        return queryset
+
+    def _update_steps(self, request, queryset, step_status, verb):
+        started = time.perf_counter()
+        touched = set_step_status(queryset, step_status)
+        self.message_user(
+            request,
+            "{} {} steps in {:.0f} ms.".format(
+                verb, touched, (time.perf_counter() - started) * 1000
+            ),
+            messages.SUCCESS,
+        )
+
+    def close_selected_steps(self, request, queryset):
+        self._update_steps(request, queryset, WorkStep.StepStatus.CLOSED, "Closed")
+
+    close_selected_steps.short_description = "Close selected steps"
+    close_selected_steps.allowed_permissions = ("change",)
+
+    def reopen_selected_steps(self, request, queryset):
+        self._update_steps(request, queryset, WorkStep.StepStatus.OPEN, "Reopened")
+
+    reopen_selected_steps.short_description = "Reopen selected steps"
+    reopen_selected_steps.allowed_permissions = ("change",)
+
+    def delete_model(self, request, obj):
+        delete_steps(WorkStep.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_steps(queryset)
+
+
+class ArchivedWorkAdmin(ReplicaReadsMixin, admin.ModelAdmin):
+    list_display = (
+        "customer",
+        "work_period",
+        "bn_release_status",
+        "customer_region",
+        "assigned_cm",
+        "assigned_lcm",
+        "archived_at",
+    )
+    list_filter = ("work_year", "work_month", "customer_region")
+    list_select_related = ("customer", "assigned_cm", "assigned_lcm")
+    ordering = ("-work_year", "-work_month", "-pk")
+    inlines = [ArchivedWorkStepInline]
+    actions = ["restore_works"]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return visible_works_for_user(queryset, request.user)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        customers = search.matching_customers(search_term, queryset.db)
+        return queryset.filter(customer__in=customers.values("pk")), False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if not can_restore_archive(request.user):
+            actions.pop("restore_works", None)
+        return actions
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def work_period(self, obj):
+        return "{}-{:02d}".format(obj.work_year, obj.work_month)
+
+    work_period.short_description = "Work Period"
+
+    def restore_works(self, request, queryset):
+        if not can_restore_archive(request.user):
+            raise PermissionDenied
+        restored, steps, skipped = restore_archived_works(queryset)
+        self.message_user(
+            request,
+            "Restored {} works ({} steps).".format(restored, steps),
+            messages.SUCCESS,
+        )
+        if skipped:
+            self.message_user(
+                request,
+                "{} works were not restored: their customer and period already have "
+                "a work.".format(skipped),
+                messages.WARNING,
+            )
+
+    restore_works.short_description = "Restore selected works"
+
+
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "requested_by",
+        "processed_customers",
+        "total_customers",
+        "works_created",
+        "steps_created",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 class SystemSettingAdmin(admin.ModelAdmin):
     list_display = ("auto_generation_enabled",)
 
 
+def visible_work_ids(user, model=Work):
+    # Subquery of the pks the user may see, or None when they see everything.
+    # Build it once per request and nest it wherever works or steps are scoped.
+    if user.is_superuser or user.role in [User.Role.HOD, User.Role.ADMIN]:
+        return None
+    works = model.objects.order_by()
+    if user.role == User.Role.LCM:
+        # Two index seeks glued with UNION ALL; the equivalent OR is often
+        # planned as a scan (SQL Server, SQLite without statistics). A work
+        # where the user is both LCM and CM appears twice, which IN ignores.
+        return (
+            works.filter(assigned_lcm=user)
+            .values("pk")
+            .union(works.filter(assigned_cm=user).values("pk"), all=True)
+        )
+    if user.role == User.Role.CM:
+        return works.filter(assigned_cm=user).values("pk")
+    return works.none().values("pk")
+
+
 def visible_works_for_user(queryset, user):
     if user.is_superuser or user.role in [User.Role.HOD, User.Role.ADMIN]:
         return queryset
     if user.role == User.Role.LCM:
-        return queryset.filter(Q(assigned_lcm=user) | Q(assigned_cm=user))
+        return queryset.filter(pk__in=visible_work_ids(user, queryset.model))
     if user.role == User.Role.CM:
         return queryset.filter(assigned_cm=user)
     return queryset.none()
 
 
+def can_restore_archive(user):
+    return user.is_superuser or user.role in [User.Role.HOD, User.Role.ADMIN]
+
+
+def can_view_kpis(user):
+    return user.is_superuser or user.role in [User.Role.HOD, User.Role.ADMIN]
+
+
 def can_batch_generate(user):
     if user.is_superuser:
         return True
     return user.role in {User.Role.LCM, User.Role.HOD, User.Role.ADMIN}
 
 
-def overview_view(request, admin_site):
-    today = timezone.localdate()
+OVERVIEW_PAGE_SIZE = 50
+GENERATION_JOBS_SHOWN = 5
+
+
+def overview_querysets(user, today):
     visible_works = visible_works_for_user(
         Work.objects.select_related("customer", "assigned_cm", "assigned_lcm"),
-        request.user,
+        user,
+    )
+    steps = WorkStep.objects.all()
+    work_ids = visible_work_ids(user)
+    if work_ids is not None:
+        # Scoping the steps to the user's works lets workstep_work_status_due_idx
+        # seek per work instead of walking every overdue step in the system.
+        steps = steps.filter(work__in=work_ids)
+
+    overdue = Q(step_status=WorkStep.StepStatus.OPEN, planned_due_date__lt=today)
+
+    # IN over the remaining statuses keeps work_bn_period_idx usable; NOT = 'FULL' scans.
+    # The overdue side is a semi-join on the step index, so the OR stays a MULTI-INDEX OR.
+    exception_works = (
+        visible_works.filter(
+            Q(bn_release_status__in=BN_ISSUE_STATUSES)
+            | Q(pk__in=steps.filter(overdue).values("work_id"))
+        )
+        .prefetch_related(
+            Prefetch(
+                "workstep_set",
+                queryset=WorkStep.objects.filter(overdue).order_by("step_no"),
+                to_attr="overdue_steps",
+            )
+        )
+        .order_by("work_year", "work_month", "pk")
     )
 
-    overdue_steps = WorkStep.objects.filter(
-        work__in=visible_works,
-        step_status=WorkStep.StepStatus.OPEN,
-        planned_due_date__lt=today,
-    ).select_related("work", "work__customer")
-
-    bn_issue_works = visible_works.exclude(bn_release_status=Work.BNReleaseStatus.FULL)
-
-    exception_work_map = {}
+    next_week = today + timedelta(days=7)
+    upcoming_steps = (
+        steps.filter(
+            step_status=WorkStep.StepStatus.OPEN,
+            planned_due_date__range=(today, next_week),
+        )
+        .select_related("work", "work__customer")
+        .order_by("planned_due_date", "pk")
+    )
 
-    for work in bn_issue_works:
-        exception_work_map[work.id] = {
-            "work": work,
-            "work_admin_url": reverse("admin:invoice_work_change", args=[work.id]),
-            "customer_label": "{} / {}".format(
-                work.customer.ile, work.customer.round_location
+    return exception_works, upcoming_steps
+
+
+def handle_overview_action(request, today):
+    action = request.POST.get("action")
+    if action not in {"bulk_current", "bulk_next"}:
+        return None
+    if not can_batch_generate(request.user):
+        return HttpResponseForbidden("Not allowed")
+    target_year = today.year
+    target_month = today.month
+    if action == "bulk_next":
+        if target_month == 12:
+            target_year += 1
+            target_month = 1
+        else:
+            target_month += 1
+    # Generation runs in the run_generation_jobs worker; the page polls progress.
+    job, created = enqueue_generation(target_year, target_month, request.user)
+    if created:
+        messages.success(
+            request,
+            "Queued bulk generation for {}-{:02d} (job #{}).".format(
+                target_year, target_month, job.pk
             ),
-            "overdue_steps": [],
-        }
-
-    for step in overdue_steps:
-        entry = exception_work_map.setdefault(
-            step.work_id,
-            {
-                "work": step.work,
-                "work_admin_url": reverse(
-                    "admin:invoice_work_change", args=[step.work_id]
-                ),
-                "customer_label": "{} / {}".format(
-                    step.work.customer.ile, step.work.customer.round_location
-                ),
-                "overdue_steps": [],
-            },
         )
-        entry["overdue_steps"].append(step)
+    else:
+        messages.info(
+            request,
+            "Bulk generation for {}-{:02d} is already {} (job #{}).".format(
+                target_year, target_month, job.get_status_display().lower(), job.pk
+            ),
+        )
+    return HttpResponseRedirect(request.get_full_path())
+
+
+def build_overview_data(user, today, exceptions_page, upcoming_page):
+    exception_works, upcoming_steps = overview_querysets(user, today)
+    return {
+        "exception_page": dashboard_cache.freeze_page(
+            Paginator(exception_works, OVERVIEW_PAGE_SIZE).get_page(exceptions_page)
+        ),
+        "upcoming_page": dashboard_cache.freeze_page(
+            Paginator(upcoming_steps, OVERVIEW_PAGE_SIZE).get_page(upcoming_page)
+        ),
+    }
+
+
+def get_overview_data(request, today):
+    exceptions_page = request.GET.get("exceptions_page")
+    upcoming_page = request.GET.get("upcoming_page")
+    # The version counters only move in processes that share the cache; the
+    # works' count and latest updated_at come from the database, so writes
+    # from any process (e.g. the generation worker) also retire the entry.
+    version = request_overview_version(request)
+    changed = version["changed"].isoformat() if version["changed"] else ""
+    return dashboard_cache.get_overview(
+        request.user,
+        today,
+        [exceptions_page, upcoming_page, version["works"], changed],
+        lambda: build_overview_data(request.user, today, exceptions_page, upcoming_page),
+    )
 
-    exception_works = list(exception_work_map.values())
 
-    next_week = today + timedelta(days=7)
-    upcoming_steps = WorkStep.objects.filter(
-        work__in=visible_works,
-        step_status=WorkStep.StepStatus.OPEN,
-        planned_due_date__range=(today, next_week),
-    ).select_related("work", "work__customer")
-    upcoming_entries = [
+def overview_version(user):
+    # Work.updated_at also moves when one of its steps changes, so a single
+    # aggregate over the user's works covers both lists. The count catches
+    # deletions, archiving and works reassigned away from the user.
+    return visible_works_for_user(Work.objects.order_by(), user).aggregate(
+        works=Count("pk"), changed=Max("updated_at")
+    )
+
+
+def request_overview_version(request):
+    if not hasattr(request, "_overview_version"):
+        request._overview_version = overview_version(request.user)
+    return request._overview_version
+
+
+def overview_validators(request):
+    # (ETag, Last-Modified), computed once per request for both condition()
+    # callbacks. POSTs and responses carrying messages are never answered 304.
+    if hasattr(request, "_overview_validators"):
+        return request._overview_validators
+    validators = (None, None)
+    if request.method in routers.SAFE_METHODS and not len(messages.get_messages(request)):
+        user = request.user
+        today = timezone.localdate()
+        version = request_overview_version(request)
+        parts = [
+            user.pk,
+            user.role,
+            today,
+            version["works"],
+            version["changed"],
+            dashboard_cache.versions_for_user(user),
+            request.get_full_path(),
+            # The page embeds a CSRF token for the generation buttons.
+            request.META.get("CSRF_COOKIE", ""),
+        ]
+        if can_batch_generate(user):
+            parts.append(
+                list(
+                    GenerationJob.objects.order_by("-pk").values_list(
+                        "pk", "status", "processed_customers"
+                    )[:GENERATION_JOBS_SHOWN]
+                )
+            )
+        # Steps become overdue at midnight without any write.
+        midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        last_modified = max(version["changed"] or midnight, midnight)
+        validators = (hashlib.sha1(repr(parts).encode()).hexdigest(), last_modified)
+    request._overview_validators = validators
+    return validators
+
+
+def conditional_overview(view):
+    # The admin normally marks pages never_cache (no-store), which also stops
+    # browsers from revalidating. These views are registered cacheable and
+    # ask for revalidation on every load instead, so an unchanged refresh is
+    # a 304 after one aggregate query.
+    view = condition(
+        etag_func=lambda request, *args, **kwargs: overview_validators(request)[0],
+        last_modified_func=lambda request, *args, **kwargs: overview_validators(request)[1],
+    )(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
+
+
+def _customer_label(customer):
+    return "{} / {}".format(customer.ile, customer.round_location)
+
+
+def _page_json(page, results):
+    return {
+        "number": page.number,
+        "num_pages": page.paginator.num_pages,
+        "count": page.paginator.count,
+        "results": results,
+    }
+
+
+def overview_feed(data):
+    work_changelist_url = reverse("admin:invoice_work_changelist")
+    exception_page = dashboard_cache.thaw_page(data["exception_page"])
+    upcoming_page = dashboard_cache.thaw_page(data["upcoming_page"])
+    exceptions = [
         {
-            "step": step,
-            "work_admin_url": reverse("admin:invoice_work_change", args=[step.work_id]),
-            "customer_label": "{} / {}".format(
-                step.work.customer.ile, step.work.customer.round_location
-            ),
+            "id": work.pk,
+            "url": "{}{}/change/".format(work_changelist_url, work.pk),
+            "customer": _customer_label(work.customer),
+            "work_year": work.work_year,
+            "work_month": work.work_month,
+            "bn_release_status": work.bn_release_status,
+            "overdue_steps": [
+                {
+                    "step_no": step.step_no,
+                    "step_label": step.step_label,
+                    "planned_due_date": step.planned_due_date,
+                }
+                for step in work.overdue_steps
+            ],
+            "assigned_cm": str(work.assigned_cm) if work.assigned_cm else None,
+            "assigned_lcm": str(work.assigned_lcm) if work.assigned_lcm else None,
+            "updated_at": work.updated_at,
+        }
+        for work in exception_page
+    ]
+    upcoming = [
+        {
+            "id": step.pk,
+            "work_id": step.work_id,
+            "url": "{}{}/change/".format(work_changelist_url, step.work_id),
+            "customer": _customer_label(step.work.customer),
+            "work_year": step.work.work_year,
+            "work_month": step.work.work_month,
+            "step_no": step.step_no,
+            "step_label": step.step_label,
+            "planned_due_date": step.planned_due_date,
+            "updated_at": step.updated_at,
         }
-        for step in upcoming_steps
+        for step in upcoming_page
     ]
+    return {
+        "exceptions": _page_json(exception_page, exceptions),
+        "upcoming": _page_json(upcoming_page, upcoming),
+    }
+
+
+@routers.replica_reads
+@conditional_overview
+def overview_feed_view(request, admin_site):
+    return JsonResponse(overview_feed(get_overview_data(request, timezone.localdate())))
+
+
+@routers.replica_reads
+@conditional_overview
+def overview_view(request, admin_site):
+    today = timezone.localdate()
 
     if request.method == "POST":
-        action = request.POST.get("action")
-        if action in {"bulk_current", "bulk_next"}:
-            if not can_batch_generate(request.user):
-                return HttpResponseForbidden("Not allowed")
-            target_year = today.year
-            target_month = today.month
-            if action == "bulk_next":
-                if target_month == 12:
-                    target_year += 1
-                    target_month = 1
-                else:
-                    target_month += 1
-            created, existed, steps_created = bulk_ensure_work_for_month(
-                target_year, target_month
-            )
-            messages.success(
-                request,
-                "Bulk generation complete: created {}, existed {}, steps created {}.".format(
-                    created, existed, steps_created
-                ),
-            )
+        response = handle_overview_action(request, today)
+        if response is not None:
+            return response
+
+    data = get_overview_data(request, today)
+    exception_page = dashboard_cache.thaw_page(data["exception_page"])
 
     context = dict(
         admin_site.each_context(request),
-        exception_works=exception_works,
-        exception_count=len(exception_works),
-        upcoming_entries=upcoming_entries,
+        exception_page=exception_page,
+        exception_count=exception_page.paginator.count,
+        upcoming_page=dashboard_cache.thaw_page(data["upcoming_page"]),
+        work_changelist_url=reverse("admin:invoice_work_changelist"),
         can_batch_generate=can_batch_generate(request.user),
+        generation_jobs=(
+            list(GenerationJob.objects.order_by("-pk")[:GENERATION_JOBS_SHOWN])
+            if can_batch_generate(request.user)
+            else []
+        ),
+        dashboard_cache_stats=dashboard_cache.stats() if request.user.is_superuser else None,
     )
     return TemplateResponse(request, "admin/invoice/dashboard.html", context)
 
@@ -403,16 +1087,39 @@ class InvoiceAdminSite(admin.AdminSite):
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
+            # Replaces the default never_cache index so the overview can
+            # answer conditional GETs; see conditional_overview.
+            path("", self.admin_view(self.index, cacheable=True), name="index"),
             path(
                 "invoice/overview/",
-                self.admin_view(self.overview_view),
+                self.admin_view(self.overview_view, cacheable=True),
                 name="invoice_dashboard",
             ),
+            path(
+                "invoice/overview.json",
+                self.admin_view(self.overview_feed_view, cacheable=True),
+                name="invoice_overview_feed",
+            ),
             path(
                 "invoice/dashboard/",
-                self.admin_view(self.overview_view),
+                self.admin_view(self.overview_view, cacheable=True),
                 name="invoice_dashboard_legacy",
             ),
+            path(
+                "invoice/jobs/<int:job_id>/",
+                self.admin_view(self.generation_job_view),
+                name="invoice_generation_job",
+            ),
+            path(
+                "invoice/kpi/",
+                self.admin_view(self.kpi_view),
+                name="invoice_kpi",
+            ),
+            path(
+                "invoice/profiling/",
+                self.admin_view(self.profiling_view),
+                name="invoice_profiling",
+            ),
             path(
                 "admin-dashboard/",
                 self.admin_view(self.admin_dashboard),
@@ -424,9 +1131,59 @@ class InvoiceAdminSite(admin.AdminSite):
     def overview_view(self, request):
         return overview_view(request, self)
 
+    def overview_feed_view(self, request):
+        return overview_feed_view(request, self)
+
     def index(self, request, extra_context=None):
         return overview_view(request, self)
 
+    def generation_job_view(self, request, job_id):
+        if not can_batch_generate(request.user):
+            raise PermissionDenied
+        job = get_object_or_404(GenerationJob, pk=job_id)
+        return JsonResponse(job.progress())
+
+    def kpi_view(self, request):
+        if not can_view_kpis(request.user):
+            raise PermissionDenied
+        dimension = request.GET.get("by")
+        if dimension not in StepKpiRollup.Dimension.values:
+            dimension = StepKpiRollup.Dimension.MONTH
+        status = reporting.status()
+        work_year = request.GET.get("year", "")
+        work_year = int(work_year) if work_year.isdigit() else None
+        if work_year is None and status["years"]:
+            work_year = status["years"][0]
+        step_no = request.GET.get("step", "")
+        step_no = int(step_no) if step_no in {"1", "2", "3", "4"} else None
+        context = dict(
+            self.each_context(request),
+            title="On-time KPIs",
+            rows=reporting.kpi_report(dimension, work_year, step_no),
+            dimension=dimension,
+            dimensions=StepKpiRollup.Dimension.choices,
+            work_year=work_year,
+            step_no=step_no,
+            step_choices=WorkStep.STEP_CHOICES,
+            status=status,
+        )
+        return TemplateResponse(request, "admin/invoice/kpi.html", context)
+
+    def profiling_view(self, request):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        if request.method == "POST":
+            instrumentation.clear()
+            return HttpResponseRedirect(request.path)
+        context = dict(
+            self.each_context(request),
+            title="Request profiling",
+            enabled=instrumentation.is_enabled(),
+            summaries=instrumentation.view_summaries(),
+            recent_requests=instrumentation.recent_requests()[:50],
+        )
+        return TemplateResponse(request, "admin/invoice/profiling.html", context)
+
     def admin_dashboard(self, request, extra_context=None):
         return super().index(request, extra_context)
 
@@ -436,6 +1193,8 @@ admin_site.register(User, UserAdmin)
 admin_site.register(Customer, CustomerAdmin)
 admin_site.register(CustomerStepRule, CustomerStepRuleAdmin)
 admin_site.register(Work, WorkAdmin)
-admin_site.register(WorkStep)
+admin_site.register(WorkStep, WorkStepAdmin)
+admin_site.register(ArchivedWork, ArchivedWorkAdmin)
+admin_site.register(GenerationJob, GenerationJobAdmin)
 admin_site.register(SystemSetting, SystemSettingAdmin)
 admin_site.register(Group, GroupAdmin)
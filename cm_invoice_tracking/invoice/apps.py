@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class InvoiceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "invoice"
+
+    def ready(self):
+        from invoice import checks, signals  # noqa: F401
+
+        post_migrate.connect(signals.install_customer_search, sender=self)
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+
+@register(Tags.caches)
+def check_dashboard_cache(app_configs, **kwargs):
+    alias = getattr(settings, "DASHBOARD_CACHE_ALIAS", "dashboard")
+    config = settings.CACHES.get(alias)
+    if config is None:
+        return [
+            Error(
+                "CACHES has no '{}' entry for the overview cache.".format(alias),
+                id="invoice.E001",
+            )
+        ]
+    if config["BACKEND"] != LOCMEM_BACKEND:
+        return []
+    if getattr(settings, "WEB_CONCURRENCY", 1) > 1:
+        return [
+            Error(
+                "The overview cache uses LocMemCache with WEB_CONCURRENCY={}.".format(
+                    settings.WEB_CONCURRENCY
+                ),
+                hint="Each process would keep its own version counters and serve stale "
+                "pages. Set DASHBOARD_CACHE_BACKEND=file or db.",
+                id="invoice.E002",
+            )
+        ]
+    return [
+        Warning(
+            "The overview cache uses LocMemCache.",
+            hint="Writes from management commands and run_generation_jobs cannot "
+            "invalidate it. Use it only for a single-process development server.",
+            id="invoice.W001",
+        )
+    ]
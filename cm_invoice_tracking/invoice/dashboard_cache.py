@@ -0,0 +1,157 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+
+from invoice.models import User
+
+KEY_PREFIX = "invoice:overview"
+ALL_SCOPE = "all"
+GLOBAL_SCOPE = "global"
+STATS_KEYS = {"hits": KEY_PREFIX + ":stats:hits", "misses": KEY_PREFIX + ":stats:misses"}
+
+
+def get_cache():
+    return caches[getattr(settings, "DASHBOARD_CACHE_ALIAS", "dashboard")]
+
+
+def scope_for_user(user):
+    if user.is_superuser or user.role in [User.Role.HOD, User.Role.ADMIN]:
+        return ALL_SCOPE
+    return "user:{}".format(user.pk)
+
+
+def _version_key(scope):
+    return "{}:version:{}".format(KEY_PREFIX, scope)
+
+
+def _incr(cache, key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+        return 1
+
+
+def _bump(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def _versions(cache, scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted counter never restarts at a
+            # value an older cached entry was stored under.
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def versions_for_user(user):
+    # The counters every cached overview entry for this user is keyed on;
+    # the overview's ETag includes them so label-only changes (a renamed
+    # customer or user) are not answered with 304.
+    return _versions(get_cache(), [scope_for_user(user), GLOBAL_SCOPE])
+
+
+def freeze_page(page):
+    return {
+        "object_list": list(page.object_list),
+        "number": page.number,
+        "count": page.paginator.count,
+        "per_page": page.paginator.per_page,
+    }
+
+
+def thaw_page(data):
+    # A range stands in for the original queryset: it knows its length and
+    # slices for free, which is all the page navigation needs.
+    paginator = Paginator(range(data["count"]), data["per_page"])
+    return Page(data["object_list"], data["number"], paginator)
+
+
+def get_overview(user, today, params, builder):
+    cache = get_cache()
+    scope = scope_for_user(user)
+    scope_version, global_version = _versions(cache, [scope, GLOBAL_SCOPE])
+    key = "{}:{}:{}:v{}.{}:{}:{}".format(
+        KEY_PREFIX,
+        scope,
+        user.role or "",
+        global_version,
+        scope_version,
+        today.isoformat(),
+        ":".join(str(value) for value in params),
+    )
+    data = cache.get(key)
+    if data is not None:
+        _incr(cache, STATS_KEYS["hits"])
+        return data
+    _incr(cache, STATS_KEYS["misses"])
+    data = builder()
+    cache.set(key, data, getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 300))
+    return data
+
+
+def cached_count(user, queryset):
+    # Changelist counts share the overview's version counters, so any write
+    # that would change what this user sees also retires the cached count.
+    cache = get_cache()
+    scope = scope_for_user(user)
+    scope_version, global_version = _versions(cache, [scope, GLOBAL_SCOPE])
+    sql, params = queryset.query.sql_with_params()
+    key = "{}:count:{}:v{}.{}:{}".format(
+        KEY_PREFIX,
+        scope,
+        global_version,
+        scope_version,
+        hashlib.sha1("{}|{}".format(sql, params).encode()).hexdigest(),
+    )
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 300))
+    return count
+
+
+def invalidate_users(user_ids):
+    cache = get_cache()
+    scopes = [ALL_SCOPE] + ["user:{}".format(user_id) for user_id in set(user_ids) if user_id]
+    for scope in scopes:
+        _bump(cache, _version_key(scope))
+
+
+def invalidate_all():
+    _bump(get_cache(), _version_key(GLOBAL_SCOPE))
+
+
+def invalidate_users_on_commit(user_ids):
+    # Bump after the write is visible: bumping inside the transaction lets
+    # another process rebuild and cache the old rows under the new version.
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: invalidate_users(user_ids))
+
+
+def invalidate_all_on_commit():
+    transaction.on_commit(invalidate_all)
+
+
+def stats():
+    cache = get_cache()
+    values = cache.get_many(STATS_KEYS.values())
+    hits = values.get(STATS_KEYS["hits"], 0)
+    misses = values.get(STATS_KEYS["misses"], 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0,
+    }
@@ -0,0 +1,61 @@
+import calendar
+from datetime import date
+from functools import lru_cache
+
+from invoice.models import CustomerStepRule
+
+DUE_DATE_CACHE_SIZE = 8192
+
+RuleType = CustomerStepRule.RuleType
+
+
+@lru_cache(maxsize=1024)
+def month_layout(year, month):
+    # (weekday of the 1st, number of days)
+    return calendar.monthrange(year, month)
+
+
+def next_month(year, month):
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+
+def rule_key(rule):
+    if rule is None:
+        return (RuleType.NO_RULE, None, None, None, None)
+    return (rule.rule_type, rule.day_of_month, rule.nth, rule.weekday, rule.last_nth)
+
+
+@lru_cache(maxsize=DUE_DATE_CACHE_SIZE)
+def due_date_for(rule_type, day_of_month, nth, weekday, last_nth, year, month):
+    if rule_type == RuleType.THIS_MONTH_DAY:
+        last_day = month_layout(year, month)[1]
+        return date(year, month, min(day_of_month, last_day))
+
+    if rule_type == RuleType.NEXT_MONTH_DAY:
+        year, month = next_month(year, month)
+        last_day = month_layout(year, month)[1]
+        return date(year, month, min(day_of_month, last_day))
+
+    if rule_type == RuleType.THIS_MONTH_NTH_WEEKDAY:
+        if weekday is None or not 0 <= weekday <= 6:
+            return None
+        first_weekday, last_day = month_layout(year, month)
+        first_match = 1 + (weekday - first_weekday) % 7
+        match_count = (last_day - first_match) // 7 + 1
+        return date(year, month, first_match + 7 * (min(nth, match_count) - 1))
+
+    if rule_type == RuleType.THIS_MONTH_LAST_NTH_DAY:
+        last_day = month_layout(year, month)[1]
+        return date(year, month, max(last_day - (last_nth - 1), 1))
+
+    return None
+
+
+def compute_planned_due_dates(rules, period_year, period_month):
+    return [due_date_for(*rule_key(rule), period_year, period_month) for rule in rules]
+
+
+def cache_info():
+    return due_date_for.cache_info()
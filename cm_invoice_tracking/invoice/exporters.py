@@ -0,0 +1,99 @@
+import csv
+import tempfile
+
+from django.db.models import Max, Q
+from django.http import FileResponse, StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+WORK_COLUMNS = [
+    ("work_id", "pk"),
+    ("ile", "customer__ile"),
+    ("round_location", "customer__round_location"),
+    ("work_year", "work_year"),
+    ("work_month", "work_month"),
+    ("bn_release_status", "bn_release_status"),
+    ("customer_region", "customer_region"),
+    ("assigned_cm", "assigned_cm__english_name"),
+    ("assigned_lcm", "assigned_lcm__english_name"),
+    ("assigned_lcm_scnx", "assigned_lcm_scnx"),
+    ("comment", "comment"),
+]
+STEP_COLUMNS = [
+    ("planned_due", "planned_due_date"),
+    ("closed", "actual_closed_date"),
+    ("status", "step_status"),
+]
+EXPORT_HEADER = [name for name, _ in WORK_COLUMNS] + [
+    "step{}_{}".format(step_no, name) for step_no in range(1, 5) for name, _ in STEP_COLUMNS
+]
+
+
+def pivot_queryset(queryset):
+    # One row per work: the four steps are folded in with conditional
+    # aggregation, so the database does the pivot in a single pass.
+    step_values = {
+        "step{}_{}".format(step_no, name): Max(
+            "workstep__{}".format(field), filter=Q(workstep__step_no=step_no)
+        )
+        for step_no in range(1, 5)
+        for name, field in STEP_COLUMNS
+    }
+    return (
+        queryset.order_by()
+        .values(*[lookup for _, lookup in WORK_COLUMNS])
+        .annotate(**step_values)
+        .values_list(*([lookup for _, lookup in WORK_COLUMNS] + list(step_values)))
+        .order_by("pk")
+    )
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in pivot_queryset(queryset).iterator(chunk_size=chunk_size):
+        yield ["" if value is None else value for value in row]
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_response(queryset, filename):
+    writer = csv.writer(Echo())
+
+    def lines():
+        # BOM so Excel opens the UTF-8 file with the right encoding.
+        yield "\ufeff" + writer.writerow(EXPORT_HEADER)
+        for row in export_rows(queryset):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = 'attachment; filename="{}.csv"'.format(filename)
+    return response
+
+
+def xlsx_response(queryset, filename):
+    from openpyxl import Workbook
+
+    # write_only workbooks flush rows to disk as they are appended, so memory
+    # stays flat; the finished file is then streamed back from disk.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Works")
+    sheet.append(EXPORT_HEADER)
+    for row in export_rows(queryset):
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename="{}.xlsx".format(filename),
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+def export_response(queryset, export_format, filename="works"):
+    if export_format == "xlsx":
+        return xlsx_response(queryset, filename)
+    return csv_response(queryset, filename)
@@ -0,0 +1,281 @@
+import codecs
+import csv
+import io
+from itertools import islice
+from zipfile import BadZipFile
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from invoice import dashboard_cache
+from invoice.models import Customer, CustomerStepRule, User
+from invoice.services import reassign_open_works, replan_open_steps
+
+IMPORT_BATCH_SIZE = 400
+# Chinese Excel saves CSV as GBK; GB18030 is its superset.
+CSV_ENCODINGS = ["utf-8-sig", "gb18030"]
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+CUSTOMER_COLUMNS = ["ile", "round_location", "region", "responsible_cm", "responsible_lcm"]
+ASSIGNMENT_FIELDS = ["region", "responsible_cm", "responsible_lcm"]
+# A missing or blank assignment cell keeps the customer's current value; this
+# token clears it.
+CLEAR_TOKEN = "-"
+RULE_FIELDS = ["rule_type", "day_of_month", "nth", "weekday", "last_nth"]
+RULE_COLUMNS = [
+    "step{}_{}".format(step_no, field) for step_no in range(1, 5) for field in RULE_FIELDS
+]
+IMPORT_COLUMNS = CUSTOMER_COLUMNS + RULE_COLUMNS
+
+
+class ImportRowError(Exception):
+    pass
+
+
+def sniff_encoding(stream):
+    # Decide from the start of the file so the rest can still be streamed.
+    sample = stream.read(ENCODING_SAMPLE_SIZE)
+    stream.seek(0)
+    for encoding in CSV_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    raise ImportRowError("The CSV file is neither UTF-8 nor GBK encoded.")
+
+
+def iter_csv_rows(stream):
+    encoding = None
+    if isinstance(stream.read(0), bytes):
+        encoding = sniff_encoding(stream)
+        stream = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    reader = csv.reader(stream)
+    try:
+        header = next(reader, None)
+        for row in reader:
+            yield header, row
+    except UnicodeDecodeError:
+        raise ImportRowError(
+            "The CSV file is not valid {} text past its first {} KB; rows in earlier "
+            "batches were already imported.".format(encoding, ENCODING_SAMPLE_SIZE // 1024)
+        )
+
+
+def iter_xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportRowError("XLSX import requires openpyxl (pip install openpyxl).")
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError, OSError):
+        raise ImportRowError("The file is not a readable .xlsx workbook.")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        for row in rows:
+            yield header, row
+    finally:
+        workbook.close()
+
+
+def iter_import_rows(stream, filename):
+    if filename.lower().endswith(".xlsx"):
+        rows = iter_xlsx_rows(stream)
+    else:
+        rows = iter_csv_rows(stream)
+    for line_no, (header, row) in enumerate(rows, start=2):
+        if header is None:
+            return
+        names = [str(name or "").strip().lower() for name in header]
+        missing = [column for column in ["ile", "round_location"] if column not in names]
+        if missing:
+            raise ImportRowError("Missing column(s): {}.".format(", ".join(missing)))
+        values = {
+            name: "" if value is None else str(value).strip()
+            for name, value in zip(names, row)
+        }
+        if any(values.values()):
+            yield line_no, values
+
+
+def _int_or_none(value, column):
+    if value in ("", None):
+        return None
+    try:
+        return int(float(value))
+    except (OverflowError, ValueError):
+        raise ImportRowError("{} must be a number.".format(column))
+
+
+def parse_row(values, users_by_name):
+    ile = values.get("ile", "")
+    round_location = values.get("round_location", "")
+    if not ile or not round_location:
+        raise ImportRowError("ile and round_location are required.")
+
+    assignment = {}
+    region = values.get("region")
+    if region:
+        if region == CLEAR_TOKEN:
+            region = None
+        elif region not in Customer.Region.values:
+            raise ImportRowError("Unknown region {!r}.".format(region))
+        assignment["region"] = region
+
+    for column in ["responsible_cm", "responsible_lcm"]:
+        name = values.get(column)
+        if not name:
+            continue
+        if name == CLEAR_TOKEN:
+            assignment[column] = None
+            continue
+        user = users_by_name.get(name)
+        if user is None:
+            raise ImportRowError("Unknown user {!r} in {}.".format(name, column))
+        assignment[column] = user
+    lcm = assignment.get("responsible_lcm")
+    if lcm and lcm.role != User.Role.LCM:
+        raise ImportRowError("Responsible LCM must have role = LCM.")
+
+    rules = {}
+    for step_no in range(1, 5):
+        prefix = "step{}_".format(step_no)
+        rule_type = values.get(prefix + "rule_type")
+        if not rule_type:
+            continue
+        if rule_type not in CustomerStepRule.RuleType.values:
+            raise ImportRowError("Unknown rule type {!r} for step {}.".format(rule_type, step_no))
+        rule = CustomerStepRule(
+            step_no=step_no,
+            rule_type=rule_type,
+            **{
+                field: _int_or_none(values.get(prefix + field), prefix + field)
+                for field in RULE_FIELDS[1:]
+            }
+        )
+        try:
+            rule.clean()
+        except ValidationError as exc:
+            raise ImportRowError("Step {}: {}".format(step_no, " ".join(exc.messages)))
+        rules[step_no] = rule
+
+    return (ile, round_location), assignment, rules
+
+
+def _upsert_batch(batch, result):
+    # Rows later in the file win when the same customer appears twice.
+    parsed = {}
+    for key, assignment, rules in batch:
+        previous_assignment, previous_rules = parsed.get(key, ({}, {}))
+        parsed[key] = ({**previous_assignment, **assignment}, {**previous_rules, **rules})
+
+    iles = {ile for ile, _ in parsed}
+    existing = {
+        (customer.ile, customer.round_location): customer
+        for customer in Customer.objects.filter(ile__in=iles)
+    }
+
+    to_create = []
+    to_update = []
+    update_fields = set()
+    for key, (assignment, _) in parsed.items():
+        current = existing.get(key)
+        if current is None:
+            to_create.append(Customer(ile=key[0], round_location=key[1], **assignment))
+            continue
+        # Only the columns the row filled in are compared and written.
+        changed = [
+            field
+            for field, value in assignment.items()
+            if getattr(current, Customer._meta.get_field(field).attname)
+            != getattr(value, "pk", value)
+        ]
+        if changed:
+            for field in changed:
+                setattr(current, field, assignment[field])
+            update_fields.update(changed)
+            to_update.append(current)
+
+    with transaction.atomic():
+        Customer.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+        if to_update:
+            Customer.objects.bulk_update(
+                to_update,
+                [field for field in ASSIGNMENT_FIELDS if field in update_fields],
+                batch_size=IMPORT_BATCH_SIZE,
+            )
+        if to_create:
+            # SQLite does not hand back primary keys from bulk_create on Django 3.2.
+            existing = {
+                (customer.ile, customer.round_location): customer
+                for customer in Customer.objects.filter(ile__in=iles)
+            }
+        customer_ids = {key: existing[key].pk for key in parsed}
+
+        current_rules = {
+            (rule.customer_id, rule.step_no): rule
+            for rule in CustomerStepRule.objects.filter(customer_id__in=customer_ids.values())
+        }
+        rules_to_create = []
+        rules_to_update = []
+        for key, (_, rules) in parsed.items():
+            for step_no, rule in rules.items():
+                rule.customer_id = customer_ids[key]
+                current = current_rules.get((rule.customer_id, step_no))
+                if current is None:
+                    rules_to_create.append(rule)
+                elif [getattr(current, field) for field in RULE_FIELDS] != [
+                    getattr(rule, field) for field in RULE_FIELDS
+                ]:
+                    rule.pk = current.pk
+                    rules_to_update.append(rule)
+        CustomerStepRule.objects.bulk_create(rules_to_create, batch_size=IMPORT_BATCH_SIZE)
+        CustomerStepRule.objects.bulk_update(
+            rules_to_update, RULE_FIELDS, batch_size=IMPORT_BATCH_SIZE
+        )
+
+    if to_update:
+        reassign_open_works([customer.pk for customer in to_update])
+    if rules_to_create or rules_to_update:
+        # bulk_create/bulk_update skip the rule post_save that re-plans steps.
+        replan_open_steps({rule.customer_id for rule in rules_to_create + rules_to_update})
+
+    result["customers_created"] += len(to_create)
+    result["customers_updated"] += len(to_update)
+    result["rules_created"] += len(rules_to_create)
+    result["rules_updated"] += len(rules_to_update)
+
+
+def import_customers(stream, filename, batch_size=IMPORT_BATCH_SIZE, max_errors=100):
+    users_by_name = {user.username: user for user in User.objects.all()}
+    result = {
+        "rows": 0,
+        "customers_created": 0,
+        "customers_updated": 0,
+        "rules_created": 0,
+        "rules_updated": 0,
+        "errors": [],
+    }
+
+    rows = iter_import_rows(stream, filename)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        batch = []
+        for line_no, values in chunk:
+            result["rows"] += 1
+            try:
+                batch.append(parse_row(values, users_by_name))
+            except ImportRowError as exc:
+                if len(result["errors"]) < max_errors:
+                    result["errors"].append((line_no, str(exc)))
+        if batch:
+            _upsert_batch(batch, result)
+
+    if result["customers_created"] or result["customers_updated"] or result["rules_created"]:
+        dashboard_cache.invalidate_all()
+    return result
@@ -0,0 +1,154 @@
+import heapq
+import math
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import ExitStack
+from functools import lru_cache
+from importlib import import_module
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+_lock = threading.Lock()
+_buffer = deque(maxlen=getattr(settings, "SQL_PROFILING_BUFFER_SIZE", 200))
+
+PROJECT_ROOT = str(settings.BASE_DIR)
+STACK_DEPTH = 6
+
+
+def is_enabled():
+    return getattr(settings, "SQL_PROFILING_ENABLED", False)
+
+
+@lru_cache(maxsize=None)
+def _skipped_files():
+    # Middleware and routers wrap every request, so they are on the stack of
+    # every query and would stand in for the view or service that ran it.
+    files = {__file__, os.path.join(PROJECT_ROOT, "manage.py")}
+    for path in list(settings.MIDDLEWARE) + list(getattr(settings, "DATABASE_ROUTERS", [])):
+        files.add(getattr(import_module(path.rsplit(".", 1)[0]), "__file__", None))
+    return files
+
+
+def _frame_label(frame):
+    if frame.filename.startswith(PROJECT_ROOT):
+        path = os.path.relpath(frame.filename, PROJECT_ROOT)
+    else:
+        path = frame.filename.rsplit("site-packages" + os.sep, 1)[-1]
+    return "{}:{} in {}".format(path, frame.lineno, frame.name)
+
+
+def _call_site():
+    stack = [frame for frame in traceback.extract_stack() if frame.filename not in _skipped_files()]
+    frames = [
+        frame
+        for frame in stack
+        if frame.filename.startswith(PROJECT_ROOT) and "site-packages" not in frame.filename
+    ]
+    if not frames:
+        # Querysets evaluated while a template renders have no project frame
+        # left; show where in Django they ran, above the database layer.
+        db_layer = os.sep + os.path.join("django", "db") + os.sep
+        frames = [frame for frame in stack if db_layer not in frame.filename]
+    return [_frame_label(frame) for frame in frames[-STACK_DEPTH:]]
+
+
+class QueryRecorder:
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.total += duration
+            # Only pay for a stack walk when the statement makes the top N.
+            if len(self.slowest) < self.keep or duration > self.slowest[0][0]:
+                entry = (duration, self.count, sql, _call_site())
+                if len(self.slowest) < self.keep:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heapreplace(self.slowest, entry)
+
+
+class SQLProfilingMiddleware:
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.keep = getattr(settings, "SQL_PROFILING_SLOWEST", 5)
+
+    def __call__(self, request):
+        recorder = QueryRecorder(self.keep)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "at": timezone.now(),
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else request.path,
+            "status": response.status_code,
+            "total_ms": elapsed * 1000,
+            "query_count": recorder.count,
+            "sql_ms": recorder.total * 1000,
+            "slowest": [
+                {"ms": duration * 1000, "sql": sql, "stack": stack_lines}
+                for duration, _, sql, stack_lines in sorted(recorder.slowest, reverse=True)
+            ],
+        }
+        with _lock:
+            _buffer.append(record)
+        return response
+
+
+def recent_requests():
+    with _lock:
+        return list(reversed(_buffer))
+
+
+def _percentile(values, percent):
+    # Nearest-rank percentile.
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def view_summaries():
+    grouped = {}
+    for record in recent_requests():
+        grouped.setdefault(record["view"], []).append(record)
+    summaries = []
+    for view, records in grouped.items():
+        totals = [record["total_ms"] for record in records]
+        summaries.append(
+            {
+                "view": view,
+                "requests": len(records),
+                "p50_ms": _percentile(totals, 50),
+                "p95_ms": _percentile(totals, 95),
+                "avg_queries": sum(record["query_count"] for record in records) / len(records),
+                "avg_sql_ms": sum(record["sql_ms"] for record in records) / len(records),
+            }
+        )
+    return sorted(summaries, key=lambda summary: summary["p95_ms"], reverse=True)
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
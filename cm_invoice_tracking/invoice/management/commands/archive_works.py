@@ -0,0 +1,95 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from invoice.management.commands.generate_work import parse_period
+from invoice.models import ArchivedWork, ArchivedWorkStep, Work, WorkStep
+from invoice.services import (
+    ARCHIVE_CHUNK_SIZE,
+    archive_cutoff,
+    archive_works,
+    before_period,
+    closed_works,
+    restore_archived_works,
+)
+
+
+def row_counts():
+    return {
+        "Work": Work.objects.count(),
+        "WorkStep": WorkStep.objects.count(),
+        "ArchivedWork": ArchivedWork.objects.count(),
+        "ArchivedWorkStep": ArchivedWorkStep.objects.count(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed works (BN FULL, every step CLOSED) older than --months into the "
+        "archive tables, or move archived works back with --restore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=settings.ARCHIVE_AFTER_MONTHS,
+            help="Keep this many months before the current one hot.",
+        )
+        parser.add_argument(
+            "--restore",
+            metavar="YYYY-MM",
+            help="Restore the archived works of this period instead of archiving.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the works that would be archived.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=ARCHIVE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        before = row_counts()
+        started = time.perf_counter()
+
+        if options["restore"]:
+            year, month = parse_period(options["restore"])
+            restored, steps, skipped = restore_archived_works(
+                ArchivedWork.objects.filter(work_year=year, work_month=month),
+                options["chunk_size"],
+            )
+            self.stdout.write(
+                "Restored {} works and {} steps for {}-{:02d} in {:.1f}s.".format(
+                    restored, steps, year, month, time.perf_counter() - started
+                )
+            )
+            if skipped:
+                self.stdout.write(
+                    "Skipped {} archived works: the period has been regenerated for "
+                    "those customers.".format(skipped)
+                )
+        else:
+            year, month = archive_cutoff(timezone.localdate(), options["months"])
+            if options["dry_run"]:
+                count = closed_works(Work.objects.filter(before_period(year, month))).count()
+                self.stdout.write(
+                    "{} closed works before {}-{:02d} would be archived.".format(
+                        count, year, month
+                    )
+                )
+                return
+            works, steps = archive_works(year, month, options["chunk_size"])
+            self.stdout.write(
+                "Archived {} works and {} steps before {}-{:02d} in {:.1f}s.".format(
+                    works, steps, year, month, time.perf_counter() - started
+                )
+            )
+
+        for table, count in row_counts().items():
+            change = count - before[table]
+            line = "  {:<17} {:>9} -> {:>9} ({:+d}".format(table, before[table], count, change)
+            if before[table]:
+                line += ", {:+.1%}".format(change / before[table])
+            self.stdout.write(line + ")")
@@ -0,0 +1,106 @@
+import calendar
+import random
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice import due_dates
+from invoice.models import CustomerStepRule
+
+
+def scan_planned_due_date(rule, period_year, period_month):
+    # Day-by-day reference implementation the closed-form engine replaced.
+    if rule is None or rule.rule_type == CustomerStepRule.RuleType.NO_RULE:
+        return None
+
+    if rule.rule_type == CustomerStepRule.RuleType.THIS_MONTH_DAY:
+        last_day = calendar.monthrange(period_year, period_month)[1]
+        return date(period_year, period_month, min(rule.day_of_month, last_day))
+
+    if rule.rule_type == CustomerStepRule.RuleType.NEXT_MONTH_DAY:
+        next_year, next_month = due_dates.next_month(period_year, period_month)
+        last_day = calendar.monthrange(next_year, next_month)[1]
+        return date(next_year, next_month, min(rule.day_of_month, last_day))
+
+    if rule.rule_type == CustomerStepRule.RuleType.THIS_MONTH_NTH_WEEKDAY:
+        days_in_month = calendar.monthrange(period_year, period_month)[1]
+        matches = []
+        for day in range(1, days_in_month + 1):
+            if date(period_year, period_month, day).weekday() == rule.weekday:
+                matches.append(day)
+        if not matches:
+            return None
+        index = min(rule.nth, len(matches)) - 1
+        return date(period_year, period_month, matches[index])
+
+    if rule.rule_type == CustomerStepRule.RuleType.THIS_MONTH_LAST_NTH_DAY:
+        last_day = calendar.monthrange(period_year, period_month)[1]
+        day = last_day - (rule.last_nth - 1)
+        if day < 1:
+            day = 1
+        return date(period_year, period_month, day)
+
+    return None
+
+
+def random_rule(rng):
+    rule_type = rng.choice(CustomerStepRule.RuleType.values)
+    return CustomerStepRule(
+        step_no=rng.randint(1, 4),
+        rule_type=rule_type,
+        day_of_month=rng.randint(1, 31),
+        nth=rng.randint(1, 5),
+        weekday=rng.randint(0, 6),
+        last_nth=rng.randint(1, 31),
+    )
+
+
+class Command(BaseCommand):
+    help = "Compare the closed-form due-date engine against the day-scan implementation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100000)
+        parser.add_argument("--rules", type=int, default=500, help="Distinct rules to cycle through.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        rules = [random_rule(rng) for _ in range(options["rules"])]
+        periods = [(year, month) for year in range(2024, 2027) for month in range(1, 13)]
+        workload = [
+            (rules[index % len(rules)], *periods[index % len(periods)])
+            for index in range(options["iterations"])
+        ]
+
+        for rule in rules:
+            for year, month in periods:
+                expected = scan_planned_due_date(rule, year, month)
+                actual = due_dates.due_date_for(*due_dates.rule_key(rule), year, month)
+                if expected != actual:
+                    raise CommandError(
+                        "Mismatch for {} {}-{:02d}: scan={} closed-form={}".format(
+                            due_dates.rule_key(rule), year, month, expected, actual
+                        )
+                    )
+
+        started = time.perf_counter()
+        for rule, year, month in workload:
+            scan_planned_due_date(rule, year, month)
+        scan_seconds = time.perf_counter() - started
+
+        due_dates.due_date_for.cache_clear()
+        started = time.perf_counter()
+        for rule, year, month in workload:
+            due_dates.due_date_for(*due_dates.rule_key(rule), year, month)
+        engine_seconds = time.perf_counter() - started
+
+        self.stdout.write(
+            "{} evaluations: scan {:.3f}s, closed-form {:.3f}s ({:.1f}x), cache {}".format(
+                len(workload),
+                scan_seconds,
+                engine_seconds,
+                scan_seconds / engine_seconds if engine_seconds else 0,
+                due_dates.cache_info(),
+            )
+        )
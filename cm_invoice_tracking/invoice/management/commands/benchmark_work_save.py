@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from invoice.models import Customer, Work
+
+
+def count_queries(action):
+    with CaptureQueriesContext(connection) as captured:
+        action()
+    return len(captured)
+
+
+def edit_comment(work_id, track_changes):
+    def action():
+        work = Work.objects.get(pk=work_id)
+        if not track_changes:
+            # Forget the loaded state so save() takes the unconditional path it used to.
+            work._loaded_values = None
+        work.comment = "benchmark"
+        work.save()
+
+    return action
+
+
+def edit_bn_status(work_id, track_changes):
+    def action():
+        work = Work.objects.get(pk=work_id)
+        if not track_changes:
+            work._loaded_values = None
+        work.bn_release_status = Work.BNReleaseStatus.PARTIAL
+        work.save()
+
+    return action
+
+
+def move_period(work_id):
+    def action():
+        work = Work.objects.get(pk=work_id)
+        work.work_year += 100
+        work.save()
+
+    return action
+
+
+class Command(BaseCommand):
+    help = "Report per-save query counts for Work with and without change tracking."
+
+    def handle(self, *args, **options):
+        work = Work.objects.order_by("pk").first()
+        customer = Customer.objects.order_by("pk").first()
+        if work is None or customer is None:
+            raise CommandError("Needs at least one Work; run generate_work first.")
+
+        rows = []
+        with transaction.atomic():
+            for label, untracked, tracked in [
+                ("comment edit", edit_comment(work.pk, False), edit_comment(work.pk, True)),
+                ("BN status edit", edit_bn_status(work.pk, False), edit_bn_status(work.pk, True)),
+            ]:
+                rows.append((label, count_queries(untracked), count_queries(tracked)))
+            period_change = count_queries(move_period(work.pk))
+            rows.append(("period change", period_change, period_change))
+            transaction.set_rollback(True)
+
+        self.stdout.write("{:<16} {:>8} {:>8}".format("save", "before", "after"))
+        for label, before, after in rows:
+            self.stdout.write("{:<16} {:>8} {:>8}".format(label, before, after))
+        self.stdout.write("(each count includes the Work.objects.get used to load the row)")
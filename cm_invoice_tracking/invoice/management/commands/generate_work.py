@@ -1,15 +1,54 @@
 import calendar
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
 
-from django.core.management.base import BaseCommand
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
 from django.utils import timezone
 
 from invoice.models import SystemSetting
-from invoice.services import bulk_ensure_work_for_month
+from invoice.services import customer_shards, generate_shard, iter_months
+
+SHARD_RETRIES = 20
+
+
+def parse_period(value):
+    parts = value.split("-")
+    if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+        year = int(parts[0])
+        month = int(parts[1])
+        if 1000 <= year <= 9999 and 1 <= month <= 12:
+            return year, month
+    raise CommandError("Period must be in YYYY-MM format: {!r}".format(value))
+
+
+def init_worker():
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def run_shard(task):
+    # Shards are idempotent, so a shard that loses the SQLite write lock to a
+    # sibling worker is simply retried in a fresh transaction.
+    try:
+        for attempt in range(SHARD_RETRIES):
+            try:
+                return generate_shard(*task)
+            except OperationalError as exc:
+                if "locked" not in str(exc) or attempt == SHARD_RETRIES - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1) + random.random() * 0.05)
+    finally:
+        connections.close_all()
 
 
 class Command(BaseCommand):
-    help = "Generate work records for the next month when auto mode is enabled."
+    help = "Generate work records for the next month, or for a range of months."
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,9 +56,35 @@ class Command(BaseCommand):
             action="store_true",
             help="Run in auto mode with trigger day check.",
         )
+        parser.add_argument(
+            "--from",
+            dest="from_period",
+            help="First period to generate (YYYY-MM). Defaults to next month.",
+        )
+        parser.add_argument(
+            "--to",
+            dest="to_period",
+            help="Last period to generate (YYYY-MM). Defaults to --from.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Worker processes; 1 (the default) runs in-process. Parallel workers "
+                "write concurrently, so prefer them on SQL Server rather than SQLite."
+            ),
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            help="Customer shards per period, each committed separately. Defaults to --workers.",
+        )
 
     def handle(self, *args, **options):
         if options.get("auto"):
+            if options.get("from_period") or options.get("to_period"):
+                raise CommandError("--auto cannot be combined with --from/--to.")
             setting = SystemSetting.objects.first()
             if not setting or not setting.auto_generation_enabled:
                 self.stdout.write("Auto generation disabled.")
@@ -32,15 +97,53 @@ class Command(BaseCommand):
                 self.stdout.write("Not trigger day.")
                 return
 
-        today = timezone.localdate()
-        next_year = today.year + 1 if today.month == 12 else today.year
-        next_month = 1 if today.month == 12 else today.month + 1
+        if options.get("from_period"):
+            start = parse_period(options["from_period"])
+        elif options.get("to_period"):
+            raise CommandError("--to requires --from.")
+        else:
+            today = timezone.localdate()
+            next_year = today.year + 1 if today.month == 12 else today.year
+            next_month = 1 if today.month == 12 else today.month + 1
+            start = (next_year, next_month)
+        end = parse_period(options["to_period"]) if options.get("to_period") else start
+        if end < start:
+            raise CommandError("--to must not be earlier than --from.")
 
-        created, existed, steps_created = bulk_ensure_work_for_month(
-            next_year, next_month
-        )
+        workers = max(options["workers"], 1)
+        shards = customer_shards(options.get("shards") or workers)
+        tasks = [
+            (work_year, work_month, first_pk, last_pk)
+            for work_year, work_month in iter_months(start, end)
+            for first_pk, last_pk in shards
+        ]
+
+        started = time.perf_counter()
+        if workers == 1 or len(tasks) <= 1:
+            results = [generate_shard(*task) for task in tasks]
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                results = list(pool.map(run_shard, tasks))
+        elapsed = time.perf_counter() - started
+
+        created = sum(result[0] for result in results)
+        existed = sum(result[1] for result in results)
+        steps_created = sum(result[2] for result in results)
         self.stdout.write(
             "Created {}, existed {}, steps created {}.".format(
                 created, existed, steps_created
             )
         )
+        self.stdout.write(
+            "{}-{:02d} to {}-{:02d}: {} shard(s) on {} worker(s) in {:.2f}s ({:.0f} works/s).".format(
+                start[0],
+                start[1],
+                end[0],
+                end[1],
+                len(tasks),
+                workers,
+                elapsed,
+                (created + existed) / elapsed if elapsed else 0,
+            )
+        )
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.importers import IMPORT_BATCH_SIZE, IMPORT_COLUMNS, ImportRowError, import_customers
+
+
+class Command(BaseCommand):
+    help = "Upsert customers and their step rules from a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="CSV or XLSX file to import.")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            "--template",
+            action="store_true",
+            help="Print the expected CSV header and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["template"]:
+            self.stdout.write(",".join(IMPORT_COLUMNS))
+            return
+        if not options["path"]:
+            raise CommandError("A file path is required.")
+
+        started = time.perf_counter()
+        try:
+            with open(options["path"], "rb") as stream:
+                result = import_customers(stream, options["path"], options["batch_size"])
+        except (OSError, ImportRowError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        for line_no, message in result["errors"]:
+            self.stderr.write("Line {}: {}".format(line_no, message))
+        self.stdout.write(
+            "{} rows in {:.2f}s: customers created {}, updated {}; rules created {}, updated {}; "
+            "errors {}.".format(
+                result["rows"],
+                elapsed,
+                result["customers_created"],
+                result["customers_updated"],
+                result["rules_created"],
+                result["rules_updated"],
+                len(result["errors"]),
+            )
+        )
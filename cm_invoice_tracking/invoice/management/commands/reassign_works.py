@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from invoice.services import REASSIGN_CHUNK_SIZE, propagate_lcm_scnx, reassign_open_works
+
+
+class Command(BaseCommand):
+    help = "Copy customers' current region/CM/LCM and LCM SCNx onto their open works."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--customer",
+            type=int,
+            action="append",
+            dest="customer_ids",
+            help="Customer id to reassign (repeatable). Defaults to all customers.",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only propagate SCNx for these LCM user ids (repeatable).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=REASSIGN_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if not options["user_ids"]:
+            touched, elapsed = reassign_open_works(options["customer_ids"], chunk_size)
+            self.stdout.write(
+                "Customer snapshot: {} works updated in {:.2f}s.".format(touched, elapsed)
+            )
+        if not options["customer_ids"]:
+            touched, elapsed = propagate_lcm_scnx(options["user_ids"], chunk_size)
+            self.stdout.write("LCM SCNx: {} works updated in {:.2f}s.".format(touched, elapsed))
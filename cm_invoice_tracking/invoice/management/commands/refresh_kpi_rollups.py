@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from invoice.reporting import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the on-time KPI rollups for periods changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild every period instead of only the changed ones.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        periods, rows = refresh_rollups(full=options["full"])
+        self.stdout.write(
+            "Refreshed {} periods ({} rollup rows) in {:.2f}s.".format(
+                periods, rows, time.perf_counter() - started
+            )
+        )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from invoice.services import REPLAN_CHUNK_SIZE, replan_all_customers, replan_open_steps
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute planned due dates of OPEN steps in the current and future periods "
+        "from the customers' current step rules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--customer",
+            type=int,
+            action="append",
+            dest="customer_ids",
+            help="Customer id to re-plan (repeatable). Defaults to all customers.",
+        )
+        parser.add_argument(
+            "--include-overridden",
+            action="store_true",
+            help="Also overwrite due dates that were edited by hand.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=REPLAN_CHUNK_SIZE,
+            help="Customers per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        protect_overridden = False if options["include_overridden"] else None
+        started = time.perf_counter()
+        if options["customer_ids"]:
+            replanned = replan_open_steps(
+                options["customer_ids"], protect_overridden=protect_overridden
+            )
+        else:
+            replanned = replan_all_customers(options["chunk_size"], protect_overridden)
+        self.stdout.write(
+            "Re-planned {} steps in {:.2f}s.".format(replanned, time.perf_counter() - started)
+        )
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from invoice.services import JOB_CHUNK_SIZE, claim_generation_job, run_generation_job
+
+
+class Command(BaseCommand):
+    help = "Run bulk generation jobs queued from the overview page."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of polling (for cron).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between checks of an empty queue.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=JOB_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_generation_job()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(
+                "Job #{}: generating {}-{:02d}...".format(job.pk, job.work_year, job.work_month)
+            )
+            started = time.perf_counter()
+            try:
+                job = run_generation_job(job, options["chunk_size"])
+            except Exception as exc:
+                self.stderr.write("Job #{} failed: {}".format(job.pk, exc))
+                continue
+            self.stdout.write(
+                "Job #{} done in {:.1f}s: created {}, existed {}, steps created {}.".format(
+                    job.pk,
+                    time.perf_counter() - started,
+                    job.works_created,
+                    job.works_existed,
+                    job.steps_created,
+                )
+            )
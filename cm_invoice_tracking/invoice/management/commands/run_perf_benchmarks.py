@@ -0,0 +1,144 @@
+import json
+import platform
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from invoice import dashboard_cache
+from invoice.management.commands.seed_perf_data import perf_customers, perf_users
+from invoice.models import User, Work
+from invoice.services import bulk_ensure_work_for_month
+
+ROLES = [User.Role.ADMIN, User.Role.HOD, User.Role.LCM, User.Role.CM]
+PAGES = {
+    "overview": "/admin/",
+    "overview_feed": "/admin/invoice/overview.json",
+    "work_changelist": "/admin/invoice/work/",
+    "workstep_changelist": "/admin/invoice/workstep/",
+    "customer_changelist": "/admin/invoice/customer/",
+}
+
+
+def measure(action, repeat):
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            action()
+            timings.append(time.perf_counter() - started)
+        queries = len(captured)
+    return {"seconds": statistics.median(timings), "queries": queries}
+
+
+def bulk_generation():
+    # Generate a period well past the seeded history and roll it back, so
+    # every repetition creates the full month from scratch.
+    with transaction.atomic():
+        bulk_ensure_work_for_month(2999, 1, perf_customers())
+        transaction.set_rollback(True)
+
+
+def page_request(client, url):
+    def action():
+        dashboard_cache.invalidate_all()
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError("{} returned {}".format(url, response.status_code))
+
+    return action
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(
+                "{}: queries {} > baseline {}".format(name, current["queries"], previous["queries"])
+            )
+        if current["seconds"] > previous["seconds"] * (1 + tolerance):
+            regressions.append(
+                "{}: {:.3f}s > baseline {:.3f}s (+{:.0%} allowed)".format(
+                    name, current["seconds"], previous["seconds"], tolerance
+                )
+            )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = "Time generation, the overview and changelists per role against seed_perf_data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--role",
+            action="append",
+            choices=ROLES,
+            help="Only time the pages for this role (repeatable), e.g. --role LCM.",
+        )
+        parser.add_argument(
+            "--skip-generation",
+            action="store_true",
+            help="Do not time bulk generation; it dominates the run on large data sets.",
+        )
+        parser.add_argument("--output", help="Write results as JSON to this path.")
+        parser.add_argument("--baseline", help="Compare against a previous JSON result.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed wall-time slowdown versus the baseline (0.25 = 25%%).",
+        )
+
+    def handle(self, *args, **options):
+        users = {}
+        for role in options["role"] or ROLES:
+            user = perf_users().filter(role=role).order_by("pk").first()
+            if user is None:
+                raise CommandError("No perf user with role {}; run seed_perf_data.".format(role))
+            users[role] = user
+
+        repeat = max(options["repeat"], 1)
+        benchmarks = {}
+        if not options["skip_generation"]:
+            benchmarks["bulk_ensure_work_for_month"] = measure(bulk_generation, repeat)
+        for role, user in users.items():
+            client = Client()
+            client.force_login(user)
+            for page, url in PAGES.items():
+                name = "{}[{}]".format(page, role)
+                benchmarks[name] = measure(page_request(client, url), repeat)
+
+        results = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "repeat": repeat,
+            "customers": perf_customers().count(),
+            "works": Work.objects.count(),
+            "benchmarks": benchmarks,
+        }
+        for name, result in benchmarks.items():
+            self.stdout.write(
+                "{:<40} {:>8.3f}s {:>6} queries".format(name, result["seconds"], result["queries"])
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as source:
+                baseline = json.load(source)
+            regressions = compare(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regressions against {}.".format(options["baseline"]))
@@ -0,0 +1,182 @@
+import random
+import time
+
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from invoice import dashboard_cache
+from invoice.management.commands.generate_work import parse_period
+from invoice.models import Customer, CustomerStepRule, User, Work, WorkStep
+from invoice.services import (
+    BN_ISSUE_STATUSES,
+    BULK_BATCH_SIZE,
+    bulk_ensure_work_for_month,
+    iter_months,
+)
+
+PERF_PREFIX = "perf_"
+PERF_ILE_PREFIX = "PERF-"
+PERF_PASSWORD = "perf-password"
+
+# Share of each role among the generated users; the rest are CMs.
+ROLE_MIX = [(User.Role.LCM, 0.3), (User.Role.HOD, 0.05), (User.Role.ADMIN, 0.05)]
+
+
+def perf_users():
+    return User.objects.filter(username__startswith=PERF_PREFIX)
+
+
+def perf_customers():
+    return Customer.objects.filter(ile__startswith=PERF_ILE_PREFIX)
+
+
+def random_rule(rng, customer_id, step_no):
+    rule_type = rng.choice(CustomerStepRule.RuleType.values)
+    rule = CustomerStepRule(customer_id=customer_id, step_no=step_no, rule_type=rule_type)
+    if rule_type in [
+        CustomerStepRule.RuleType.THIS_MONTH_DAY,
+        CustomerStepRule.RuleType.NEXT_MONTH_DAY,
+    ]:
+        rule.day_of_month = rng.randint(1, 31)
+    elif rule_type == CustomerStepRule.RuleType.THIS_MONTH_NTH_WEEKDAY:
+        rule.nth = rng.randint(1, 5)
+        rule.weekday = rng.randint(0, 6)
+    elif rule_type == CustomerStepRule.RuleType.THIS_MONTH_LAST_NTH_DAY:
+        rule.last_nth = rng.randint(1, 10)
+    return rule
+
+
+class Command(BaseCommand):
+    help = "Create a deterministic synthetic data set for performance benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--customers", type=int, default=2000)
+        parser.add_argument("--months", type=int, default=12)
+        parser.add_argument(
+            "--start",
+            default="2024-01",
+            help="First generated period (YYYY-MM).",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--closed-ratio",
+            type=float,
+            default=0.8,
+            help="Share of steps (and FULL BN releases) closed in generated history.",
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete previously seeded perf data first.",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if options["reset"]:
+            perf_customers().delete()
+            perf_users().delete()
+        elif perf_users().exists():
+            raise CommandError("Perf data already exists; pass --reset to recreate it.")
+        if options["users"] < 4:
+            raise CommandError("--users must be at least 4 (one per role).")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.create_users(rng, options["users"])
+            self.create_customers(rng, users, options["customers"])
+
+        start = parse_period(options["start"])
+        last_index = start[0] * 12 + start[1] - 1 + max(options["months"], 1) - 1
+        end = (last_index // 12, last_index % 12 + 1)
+        totals = [0, 0, 0]
+        for work_year, work_month in iter_months(start, end):
+            counts = bulk_ensure_work_for_month(work_year, work_month, perf_customers())
+            totals = [total + count for total, count in zip(totals, counts)]
+
+        self.close_history(options["seed"], options["closed_ratio"])
+        dashboard_cache.invalidate_all()
+        self.stdout.write(
+            "Seeded {} users, {} customers, {} works, {} steps in {:.1f}s.".format(
+                options["users"],
+                options["customers"],
+                totals[0],
+                WorkStep.objects.filter(work__customer__in=perf_customers()).count(),
+                time.perf_counter() - started,
+            )
+        )
+
+    def create_users(self, rng, count):
+        roles = [User.Role.ADMIN, User.Role.HOD, User.Role.LCM, User.Role.CM]
+        for index in range(len(roles), count):
+            value = rng.random()
+            role = User.Role.CM
+            for candidate, share in ROLE_MIX:
+                if value < share:
+                    role = candidate
+                    break
+                value -= share
+            roles.append(role)
+
+        template = User(username="template")
+        template.set_password(PERF_PASSWORD)
+        users = [
+            User(
+                username="{}{}_{:04d}".format(PERF_PREFIX, role.lower(), index),
+                english_name="Perf {} {:04d}".format(role, index),
+                role=role,
+                scnx=rng.choice(User.Scnx.values) if role == User.Role.LCM else None,
+                is_staff=True,
+                password=template.password,
+            )
+            for index, role in enumerate(roles)
+        ]
+        User.objects.bulk_create(users, batch_size=BULK_BATCH_SIZE)
+        users = list(perf_users().order_by("pk"))
+
+        permissions = list(Permission.objects.filter(content_type__app_label="invoice"))
+        for user in users:
+            user.user_permissions.set(permissions)
+        return users
+
+    def create_customers(self, rng, users, count):
+        cms = [user for user in users if user.role == User.Role.CM]
+        lcms = [user for user in users if user.role == User.Role.LCM]
+        customers = [
+            Customer(
+                ile="{}{:05d}".format(PERF_ILE_PREFIX, index // 4),
+                round_location="R{}".format(index % 4),
+                region=rng.choice(Customer.Region.values),
+                responsible_cm=rng.choice(cms),
+                responsible_lcm=rng.choice(lcms),
+            )
+            for index in range(count)
+        ]
+        Customer.objects.bulk_create(customers, batch_size=BULK_BATCH_SIZE)
+        rules = [
+            random_rule(rng, customer_id, step_no)
+            for customer_id in perf_customers().order_by("pk").values_list("pk", flat=True)
+            for step_no in range(1, 5)
+        ]
+        CustomerStepRule.objects.bulk_create(rules, batch_size=BULK_BATCH_SIZE)
+
+    def close_history(self, seed, closed_ratio):
+        # Deterministic pseudo-random buckets computed in SQL, so closing
+        # history is a handful of UPDATEs instead of a bulk_update per row.
+        threshold = int(closed_ratio * 100)
+        bucket = (F("pk") * 7919 + seed) % 100
+        WorkStep.objects.filter(work__customer__in=perf_customers()).annotate(
+            bucket=bucket
+        ).filter(bucket__lt=threshold, planned_due_date__isnull=False).update(
+            step_status=WorkStep.StepStatus.CLOSED,
+            actual_closed_date=F("planned_due_date"),
+        )
+
+        works = Work.objects.filter(customer__in=perf_customers()).annotate(bucket=bucket)
+        works.filter(bucket__lt=threshold).update(bn_release_status=Work.BNReleaseStatus.FULL)
+        for index, status in enumerate(BN_ISSUE_STATUSES):
+            works.filter(bucket__gte=threshold).annotate(
+                status_bucket=F("pk") % len(BN_ISSUE_STATUSES)
+            ).filter(status_bucket=index).update(bn_release_status=status)
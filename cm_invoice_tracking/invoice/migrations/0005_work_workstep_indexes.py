@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0004_alter_user_role"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="work",
+            index=models.Index(fields=["work_year", "work_month"], name="work_period_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="work",
+            index=models.Index(
+                fields=["assigned_cm", "work_year", "work_month"], name="work_cm_period_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="work",
+            index=models.Index(
+                fields=["assigned_lcm", "work_year", "work_month"], name="work_lcm_period_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="work",
+            index=models.Index(
+                fields=["bn_release_status", "work_year", "work_month"],
+                name="work_bn_period_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workstep",
+            index=models.Index(
+                fields=["step_status", "planned_due_date"], name="workstep_status_due_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# Prefix indexes behind the admin autocomplete lookups (istartswith). SQLite's
+# LIKE is case-insensitive, so it only uses an index built with NOCASE; SQL
+# Server's default collation is already case-insensitive, so a plain index does.
+# ile and username are already the leading column of a unique index elsewhere.
+SEARCH_INDEXES = [
+    ("customer_ile_nocase_idx", "invoice_customer", "ile", True),
+    ("customer_round_location_idx", "invoice_customer", "round_location", False),
+    ("user_username_nocase_idx", "invoice_user", "username", True),
+    ("user_english_name_idx", "invoice_user", "english_name", False),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    sqlite = schema_editor.connection.vendor == "sqlite"
+    for name, table, column, sqlite_only in SEARCH_INDEXES:
+        if sqlite_only and not sqlite:
+            continue
+        schema_editor.execute(
+            "CREATE INDEX {} ON {} ({}{})".format(
+                quote(name), quote(table), quote(column), " COLLATE NOCASE" if sqlite else ""
+            )
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    sqlite = schema_editor.connection.vendor == "sqlite"
+    for name, table, _, sqlite_only in SEARCH_INDEXES:
+        if sqlite_only and not sqlite:
+            continue
+        if sqlite:
+            schema_editor.execute("DROP INDEX {}".format(quote(name)))
+        else:
+            schema_editor.execute("DROP INDEX {} ON {}".format(quote(name), quote(table)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0005_work_workstep_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0006_autocomplete_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GenerationJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("work_year", models.IntegerField()),
+                ("work_month", models.IntegerField()),
+                ("status", models.CharField(choices=[("QUEUED", "Queued"), ("RUNNING", "Running"), ("DONE", "Done"), ("FAILED", "Failed")], default="QUEUED", max_length=10)),
+                ("total_customers", models.IntegerField(default=0)),
+                ("processed_customers", models.IntegerField(default=0)),
+                ("works_created", models.IntegerField(default=0)),
+                ("works_existed", models.IntegerField(default=0)),
+                ("steps_created", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("heartbeat_at", models.DateTimeField(blank=True, null=True)),
+                ("requested_by", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="generationjob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(status__in=["QUEUED", "RUNNING"]),
+                fields=("work_year", "work_month"),
+                name="uniq_active_generation_job",
+            ),
+        ),
+    ]
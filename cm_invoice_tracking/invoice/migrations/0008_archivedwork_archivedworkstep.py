@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0007_generationjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedWork",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("work_year", models.PositiveSmallIntegerField()),
+                ("work_month", models.PositiveSmallIntegerField()),
+                ("bn_release_status", models.CharField(choices=[("OPEN", "Open"), ("FULL", "Full"), ("PARTIAL", "Partial"), ("NONE", "None")], max_length=20)),
+                ("comment", models.TextField(blank=True)),
+                ("customer_region", models.CharField(blank=True, max_length=10, null=True)),
+                ("assigned_lcm_scnx", models.CharField(blank=True, max_length=10, null=True)),
+                ("archived_at", models.DateTimeField()),
+                ("assigned_cm", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="archived_cm_works", to=settings.AUTH_USER_MODEL)),
+                ("assigned_lcm", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="archived_lcm_works", to=settings.AUTH_USER_MODEL)),
+                ("customer", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="archived_works", to="invoice.customer")),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedWorkStep",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("step_no", models.IntegerField(choices=[(1, "Step1. Customer billing notification alignment"), (2, "Step2. RB internal mapping"), (3, "Step3. Billing data adjustment"), (4, "Step4. Invoice issue & booking")])),
+                ("planned_due_date", models.DateField(blank=True, null=True)),
+                ("actual_closed_date", models.DateField(blank=True, null=True)),
+                ("step_status", models.CharField(choices=[("OPEN", "Open"), ("CLOSED", "Closed")], max_length=10)),
+                ("step_comment", models.TextField(blank=True)),
+                ("work", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="invoice.archivedwork")),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="archivedwork",
+            index=models.Index(fields=["work_year", "work_month"], name="archivedwork_period_idx"),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0008_archivedwork_archivedworkstep"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workstep",
+            name="due_date_overridden",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="archivedworkstep",
+            name="due_date_overridden",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0009_workstep_due_date_overridden"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StepKpiRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("work_year", models.PositiveSmallIntegerField()),
+                ("work_month", models.PositiveSmallIntegerField()),
+                ("step_no", models.IntegerField(choices=[(1, "Step1. Customer billing notification alignment"), (2, "Step2. RB internal mapping"), (3, "Step3. Billing data adjustment"), (4, "Step4. Invoice issue & booking")])),
+                ("dimension", models.CharField(choices=[("month", "Month"), ("cm", "CM"), ("lcm", "LCM"), ("region", "Region")], max_length=10)),
+                ("customer_region", models.CharField(blank=True, max_length=10, null=True)),
+                ("total_steps", models.IntegerField(default=0)),
+                ("open_steps", models.IntegerField(default=0)),
+                ("closed_steps", models.IntegerField(default=0)),
+                ("closed_on_time", models.IntegerField(default=0)),
+                ("closed_late", models.IntegerField(default=0)),
+                ("refreshed_at", models.DateTimeField()),
+                ("user", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="KpiStalePeriod",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("work_year", models.PositiveSmallIntegerField()),
+                ("work_month", models.PositiveSmallIntegerField()),
+                ("marked_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="stepkpirollup",
+            index=models.Index(fields=["dimension", "work_year", "work_month"], name="kpirollup_dim_period_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="kpistaleperiod",
+            constraint=models.UniqueConstraint(fields=("work_year", "work_month"), name="uniq_kpi_stale_period"),
+        ),
+    ]
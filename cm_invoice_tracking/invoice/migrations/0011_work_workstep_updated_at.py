@@ -0,0 +1,50 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0010_stepkpirollup_kpistaleperiod"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="work",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="workstep",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="archivedwork",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="archivedworkstep",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="work",
+            index=models.Index(fields=["updated_at"], name="work_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="work",
+            index=models.Index(fields=["assigned_cm", "updated_at"], name="work_cm_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="work",
+            index=models.Index(fields=["assigned_lcm", "updated_at"], name="work_lcm_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="workstep",
+            index=models.Index(fields=["updated_at"], name="workstep_updated_idx"),
+        ),
+    ]
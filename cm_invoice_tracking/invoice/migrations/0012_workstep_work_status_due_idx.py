@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invoice", "0011_work_workstep_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="workstep",
+            index=models.Index(
+                fields=["work", "step_status", "planned_due_date"],
+                name="workstep_work_status_due_idx",
+            ),
+        ),
+    ]
@@ -175,6 +175,9 @@ class Work(models.Model):
         null=True,
     )
     assigned_lcm_scnx = models.CharField(max_length=10, blank=True, null=True)
+    # Bulk updates bypass auto_now and set it themselves; the overview's
+    # ETag/Last-Modified come from the latest value a user can see.
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
@@ -183,20 +186,72 @@ class Work(models.Model):
                 name="uniq_work_customer_year_month",
             )
         ]
+        indexes = [
+            models.Index(fields=["work_year", "work_month"], name="work_period_idx"),
+            models.Index(
+                fields=["assigned_cm", "work_year", "work_month"], name="work_cm_period_idx"
+            ),
+            models.Index(
+                fields=["assigned_lcm", "work_year", "work_month"], name="work_lcm_period_idx"
+            ),
+            models.Index(
+                fields=["bn_release_status", "work_year", "work_month"],
+                name="work_bn_period_idx",
+            ),
+            models.Index(fields=["updated_at"], name="work_updated_idx"),
+            models.Index(fields=["assigned_cm", "updated_at"], name="work_cm_updated_idx"),
+            models.Index(fields=["assigned_lcm", "updated_at"], name="work_lcm_updated_idx"),
+        ]
 
     def __str__(self):
         return "{} {}-{:02d}".format(self.customer, self.work_year, self.work_month)
 
+    PLANNING_FIELDS = ("customer_id", "work_year", "work_month")
+    SNAPSHOT_FIELDS = ("customer_region", "assigned_cm", "assigned_lcm", "assigned_lcm_scnx")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self, fields):
+        loaded = getattr(self, "_loaded_values", None)
+        if self._state.adding or loaded is None:
+            return set(fields)
+        return {
+            field
+            for field in fields
+            if field not in loaded or loaded[field] != getattr(self, field)
+        }
+
     def save(self, *args, **kwargs):
-        if self.customer_id:
+        update_fields = kwargs.get("update_fields")
+        planning_fields = self.PLANNING_FIELDS
+        if update_fields is not None:
+            named = {self._meta.get_field(name).attname for name in update_fields}
+            planning_fields = [field for field in planning_fields if field in named]
+            kwargs["update_fields"] = update_fields = set(update_fields) | {"updated_at"}
+        needs_planning = bool(self.changed_fields(planning_fields))
+
+        if needs_planning and self.customer_id:
             self.customer_region = self.customer.region
             self.assigned_cm = self.customer.responsible_cm
             self.assigned_lcm = self.customer.responsible_lcm
             self.assigned_lcm_scnx = getattr(self.assigned_lcm, "scnx", None)
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | set(self.SNAPSHOT_FIELDS)
         super().save(*args, **kwargs)
-        from invoice.services import ensure_steps_for_work
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
 
-        ensure_steps_for_work(self)
+        if needs_planning:
+            from invoice.services import ensure_steps_for_work
+
+            ensure_steps_for_work(self)
 
 
 class WorkStep(models.Model):
@@ -214,11 +269,25 @@ class WorkStep(models.Model):
         max_length=10, choices=StepStatus.choices, default=StepStatus.OPEN
     )
     step_comment = models.TextField(blank=True)
+    # Set when someone edits planned_due_date by hand; re-planning after a
+    # rule change leaves these dates alone (REPLAN_PROTECT_OVERRIDDEN_DATES).
+    due_date_overridden = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["work", "step_no"], name="unique_work_step")
         ]
+        indexes = [
+            models.Index(
+                fields=["step_status", "planned_due_date"], name="workstep_status_due_idx"
+            ),
+            models.Index(fields=["updated_at"], name="workstep_updated_idx"),
+            models.Index(
+                fields=["work", "step_status", "planned_due_date"],
+                name="workstep_work_status_due_idx",
+            ),
+        ]
 
     @staticmethod
     def get_step_label(step_no):
@@ -231,12 +300,177 @@ class WorkStep(models.Model):
     def save(self, *args, **kwargs):
         if self.step_status == self.StepStatus.CLOSED and self.actual_closed_date is None:
             self.actual_closed_date = timezone.localdate()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"updated_at"}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return "{} {}".format(self.work, self.get_step_label(self.step_no))
 
 
+# Closed history moved out of Work/WorkStep by the archive_works command.
+# Rows keep their original ids and columns, so they can be restored as-is.
+class ArchivedWork(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, related_name="archived_works", on_delete=models.CASCADE)
+    work_year = models.PositiveSmallIntegerField()
+    work_month = models.PositiveSmallIntegerField()
+    bn_release_status = models.CharField(max_length=20, choices=Work.BNReleaseStatus.choices)
+    comment = models.TextField(blank=True)
+    customer_region = models.CharField(max_length=10, blank=True, null=True)
+    assigned_cm = models.ForeignKey(
+        User,
+        related_name="archived_cm_works",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    assigned_lcm = models.ForeignKey(
+        User,
+        related_name="archived_lcm_works",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    assigned_lcm_scnx = models.CharField(max_length=10, blank=True, null=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["work_year", "work_month"], name="archivedwork_period_idx"),
+        ]
+
+    def __str__(self):
+        return "{} {}-{:02d}".format(self.customer, self.work_year, self.work_month)
+
+
+class ArchivedWorkStep(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    work = models.ForeignKey(ArchivedWork, on_delete=models.CASCADE)
+    step_no = models.IntegerField(choices=WorkStep.STEP_CHOICES)
+    planned_due_date = models.DateField(blank=True, null=True)
+    actual_closed_date = models.DateField(blank=True, null=True)
+    step_status = models.CharField(max_length=10, choices=WorkStep.StepStatus.choices)
+    step_comment = models.TextField(blank=True)
+    due_date_overridden = models.BooleanField(default=False)
+    updated_at = models.DateTimeField()
+
+    @property
+    def step_label(self):
+        return WorkStep.get_step_label(self.step_no)
+
+    def __str__(self):
+        return "{} {}".format(self.work, self.step_label)
+
+
+# On-time closure counts per period and step, one row per CM, per LCM, per
+# region and one overall ("month"), kept by invoice.reporting so the KPI
+# report never aggregates WorkStep itself.
+class StepKpiRollup(models.Model):
+    class Dimension(models.TextChoices):
+        MONTH = "month", "Month"
+        CM = "cm", "CM"
+        LCM = "lcm", "LCM"
+        REGION = "region", "Region"
+
+    work_year = models.PositiveSmallIntegerField()
+    work_month = models.PositiveSmallIntegerField()
+    step_no = models.IntegerField(choices=WorkStep.STEP_CHOICES)
+    dimension = models.CharField(max_length=10, choices=Dimension.choices)
+    user = models.ForeignKey(
+        User, related_name="+", on_delete=models.SET_NULL, blank=True, null=True
+    )
+    customer_region = models.CharField(max_length=10, blank=True, null=True)
+    total_steps = models.IntegerField(default=0)
+    open_steps = models.IntegerField(default=0)
+    closed_steps = models.IntegerField(default=0)
+    closed_on_time = models.IntegerField(default=0)
+    closed_late = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["dimension", "work_year", "work_month"], name="kpirollup_dim_period_idx"
+            ),
+        ]
+
+
+class KpiStalePeriod(models.Model):
+    work_year = models.PositiveSmallIntegerField()
+    work_month = models.PositiveSmallIntegerField()
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["work_year", "work_month"], name="uniq_kpi_stale_period"
+            )
+        ]
+
+
+class GenerationJob(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", "Queued"
+        RUNNING = "RUNNING", "Running"
+        DONE = "DONE", "Done"
+        FAILED = "FAILED", "Failed"
+
+    ACTIVE_STATUSES = [Status.QUEUED, Status.RUNNING]
+
+    work_year = models.IntegerField()
+    work_month = models.IntegerField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    total_customers = models.IntegerField(default=0)
+    processed_customers = models.IntegerField(default=0)
+    works_created = models.IntegerField(default=0)
+    works_existed = models.IntegerField(default=0)
+    steps_created = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Bumped with every progress write; a RUNNING job that stops moving is
+    # taken over by the next worker.
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["work_year", "work_month"],
+                condition=models.Q(status__in=["QUEUED", "RUNNING"]),
+                name="uniq_active_generation_job",
+            )
+        ]
+
+    def __str__(self):
+        return "Generate {}-{:02d} ({})".format(self.work_year, self.work_month, self.status)
+
+    @property
+    def eta_seconds(self):
+        if self.status != self.Status.RUNNING or not self.processed_customers:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = self.total_customers - self.processed_customers
+        return max(remaining, 0) * elapsed / self.processed_customers
+
+    def progress(self):
+        return {
+            "id": self.pk,
+            "period": "{}-{:02d}".format(self.work_year, self.work_month),
+            "status": self.status,
+            "total_customers": self.total_customers,
+            "processed_customers": self.processed_customers,
+            "works_created": self.works_created,
+            "works_existed": self.works_existed,
+            "steps_created": self.steps_created,
+            "eta_seconds": None if self.eta_seconds is None else round(self.eta_seconds),
+            "error": self.error,
+        }
+
+
 class SystemSetting(models.Model):
     auto_generation_enabled = models.BooleanField(default=False)
 
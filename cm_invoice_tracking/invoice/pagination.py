@@ -0,0 +1,210 @@
+import base64
+import json
+
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from invoice import dashboard_cache
+
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+CURSOR_VARS = (AFTER_VAR, BEFORE_VAR)
+# Backends that compare row values, e.g. (a, b, id) < (1, 2, 3), against an index.
+ROW_VALUE_VENDORS = {"sqlite", "postgresql"}
+
+
+def encode_cursor(values):
+    raw = json.dumps([str(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_fields(queryset):
+    # [(field, descending), ...] for the queryset's ordering, or None when the
+    # ordering cannot be seeked on: expressions, related or nullable fields.
+    opts = queryset.model._meta
+    fields = []
+    for item in queryset.query.order_by:
+        if not isinstance(item, str) or "__" in item or item == "?":
+            return None
+        descending = item.startswith("-")
+        name = item.lstrip("-")
+        try:
+            field = opts.pk if name == "pk" else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.is_relation or field.null:
+            return None
+        fields.append((field, descending))
+    if not fields or fields[-1][0] != opts.pk:
+        return None
+    return fields
+
+
+def _seek(queryset, fields, values, forward):
+    # Rows strictly after (forward) or before the cursor in the ordering.
+    if len({descending for _, descending in fields}) == 1 and (
+        connections[queryset.db].vendor in ROW_VALUE_VENDORS
+    ):
+        qn = connections[queryset.db].ops.quote_name
+        table = qn(queryset.model._meta.db_table)
+        columns = ", ".join("{}.{}".format(table, qn(field.column)) for field, _ in fields)
+        operator = "<" if fields[0][1] == forward else ">"
+        return queryset.extra(
+            where=["({}) {} ({})".format(columns, operator, ", ".join(["%s"] * len(values)))],
+            params=values,
+        )
+
+    condition = Q()
+    for index, (field, descending) in enumerate(fields):
+        lookup = "lt" if descending == forward else "gt"
+        step = Q(**{"{}__{}".format(field.attname, lookup): values[index]})
+        for previous_index in range(index):
+            step &= Q(**{fields[previous_index][0].attname: values[previous_index]})
+        condition |= step
+    # Bound the leading column too, so the index scan starts near the cursor.
+    field, descending = fields[0]
+    bound = "lte" if descending == forward else "gte"
+    return queryset.filter(condition, **{"{}__{}".format(field.attname, bound): values[0]})
+
+
+# Seeks from the previous page's last (or the next page's first) row instead of
+# using OFFSET, so stepping through pages stays constant-time however deep it
+# goes; jumping straight to a page number still uses OFFSET. Counts come from
+# dashboard_cache.cached_count instead of a COUNT(*) per request.
+class KeysetPaginator(Paginator):
+    def __init__(self, object_list, per_page, user, after=None, before=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+        self.after = decode_cursor(after)
+        self.before = decode_cursor(before)
+        self.fields = keyset_fields(object_list)
+        self.page_queryset = None
+
+    @cached_property
+    def count(self):
+        return dashboard_cache.cached_count(self.user, self.object_list)
+
+    def _cursor_values(self, values):
+        if self.fields is None or values is None or len(values) != len(self.fields):
+            return None
+        try:
+            return [field.to_python(value) for (field, _), value in zip(self.fields, values)]
+        except ValidationError:
+            return None
+
+    def page(self, number):
+        number = self.validate_number(number)
+        after = self._cursor_values(self.after)
+        before = self._cursor_values(self.before)
+        if after is not None:
+            queryset = _seek(self.object_list, self.fields, after, forward=True)[: self.per_page]
+        elif before is not None:
+            # Walk backwards from the cursor, then restore the display order. The
+            # ids are fetched first: the row-value seek names the outer table and
+            # cannot sit inside a subquery.
+            previous = _seek(self.object_list, self.fields, before, forward=False)
+            pks = list(previous.reverse().values_list("pk", flat=True)[: self.per_page])
+            queryset = self.object_list.filter(pk__in=pks)
+        else:
+            remainder = self._last_page_size(number)
+            if remainder is None:
+                page = super().page(number)
+                self.page_queryset = page.object_list
+                return page
+            # The last page is the first page of the reversed ordering.
+            pks = self.object_list.reverse().values("pk")[:remainder]
+            queryset = self.object_list.filter(pk__in=pks)
+        self.page_queryset = queryset
+        return Page(queryset, number, self)
+
+    def _last_page_size(self, number):
+        # Rows on the last page, from an exact COUNT: the cached count can lag
+        # behind inserts and deletes, and a wrong size would repeat or skip
+        # rows of the page before. None falls back to OFFSET.
+        if number != self.num_pages or number == 1 or self.fields is None:
+            return None
+        remainder = self.object_list.count() - (number - 1) * self.per_page
+        if 0 < remainder <= self.per_page + self.orphans:
+            return remainder
+        return None
+
+    def _row_cursor(self, row):
+        return encode_cursor([getattr(row, field.attname) for field, _ in self.fields])
+
+    @cached_property
+    def next_cursor(self):
+        if self.fields is None or self.page_queryset is None:
+            return None
+        rows = list(self.page_queryset)
+        return self._row_cursor(rows[-1]) if rows else None
+
+    @cached_property
+    def previous_cursor(self):
+        if self.fields is None or self.page_queryset is None:
+            return None
+        rows = list(self.page_queryset)
+        return self._row_cursor(rows[0]) if rows else None
+
+
+class KeysetChangeList(ChangeList):
+    def __init__(self, request, *args, **kwargs):
+        super().__init__(request, *args, **kwargs)
+        # Page links are built from params; the cursor only belongs to this page.
+        for name in CURSOR_VARS:
+            self.params.pop(name, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for name in CURSOR_VARS:
+            lookup_params.pop(name, None)
+        return lookup_params
+
+    def next_page_url(self):
+        cursor = self.paginator.next_cursor
+        if cursor is None:
+            return self.get_query_string({PAGE_VAR: self.page_num + 1})
+        return self.get_query_string({PAGE_VAR: self.page_num + 1, AFTER_VAR: cursor})
+
+    def previous_page_url(self):
+        if self.page_num <= 2:
+            return self.get_query_string(remove=[PAGE_VAR])
+        cursor = self.paginator.previous_cursor
+        if cursor is None:
+            return self.get_query_string({PAGE_VAR: self.page_num - 1})
+        return self.get_query_string({PAGE_VAR: self.page_num - 1, BEFORE_VAR: cursor})
+
+    def last_page_url(self):
+        return self.get_query_string({PAGE_VAR: self.paginator.num_pages})
+
+
+class KeysetPaginationMixin:
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return KeysetPaginator(
+            queryset,
+            per_page,
+            request.user,
+            after=request.GET.get(AFTER_VAR),
+            before=request.GET.get(BEFORE_VAR),
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+        )
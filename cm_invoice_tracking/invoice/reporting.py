@@ -0,0 +1,177 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from invoice.models import ArchivedWorkStep, KpiStalePeriod, StepKpiRollup, WorkStep
+
+Dimension = StepKpiRollup.Dimension
+COUNTERS = ("total_steps", "open_steps", "closed_steps", "closed_on_time", "closed_late")
+REFRESH_PERIOD_CHUNK = 12
+
+# Rollup dimension -> the Work column it groups by and the rollup field it lands in.
+DIMENSION_COLUMNS = {
+    Dimension.MONTH: None,
+    Dimension.CM: ("assigned_cm_id", "user_id"),
+    Dimension.LCM: ("assigned_lcm_id", "user_id"),
+    Dimension.REGION: ("customer_region", "customer_region"),
+}
+
+
+def _periods_q(periods, prefix=""):
+    condition = Q()
+    for work_year, work_month in periods:
+        condition |= Q(**{prefix + "work_year": work_year, prefix + "work_month": work_month})
+    return condition
+
+
+def mark_stale(periods):
+    # Called wherever steps or their works change; the next refresh only
+    # recomputes these periods.
+    periods = {(int(work_year), int(work_month)) for work_year, work_month in periods}
+    if not periods:
+        return
+    marked = set(
+        KpiStalePeriod.objects.filter(_periods_q(periods)).values_list("work_year", "work_month")
+    )
+    missing = periods - marked
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            KpiStalePeriod.objects.bulk_create(
+                [KpiStalePeriod(work_year=year, work_month=month) for year, month in missing]
+            )
+    except IntegrityError:
+        # Another writer marked some of them in the meantime.
+        for year, month in missing:
+            KpiStalePeriod.objects.get_or_create(work_year=year, work_month=month)
+
+
+def _aggregate(steps, column):
+    # One GROUP BY with conditional counts per dimension.
+    closed = Q(step_status=WorkStep.StepStatus.CLOSED)
+    group = {"work_year": F("work__work_year"), "work_month": F("work__work_month")}
+    if column is not None:
+        group["key"] = F("work__" + column)
+    return (
+        steps.order_by()
+        .values("step_no", **group)
+        .annotate(
+            total_steps=Count("pk"),
+            open_steps=Count("pk", filter=Q(step_status=WorkStep.StepStatus.OPEN)),
+            closed_steps=Count("pk", filter=closed),
+            closed_on_time=Count(
+                "pk", filter=closed & Q(actual_closed_date__lte=F("planned_due_date"))
+            ),
+            closed_late=Count(
+                "pk", filter=closed & Q(actual_closed_date__gt=F("planned_due_date"))
+            ),
+        )
+    )
+
+
+def compute_rollups(periods=None):
+    totals = {}
+    # Archived steps count too, so archiving a period leaves its KPIs as they were.
+    for model in (WorkStep, ArchivedWorkStep):
+        steps = model.objects.all()
+        if periods is not None:
+            steps = steps.filter(_periods_q(periods, prefix="work__"))
+        for dimension, columns in DIMENSION_COLUMNS.items():
+            for row in _aggregate(steps, columns and columns[0]):
+                key = (
+                    dimension,
+                    row["work_year"],
+                    row["work_month"],
+                    row["step_no"],
+                    row.get("key"),
+                )
+                counts = totals.setdefault(key, dict.fromkeys(COUNTERS, 0))
+                for counter in COUNTERS:
+                    counts[counter] += row[counter]
+
+    refreshed_at = timezone.now()
+    rollups = []
+    for (dimension, work_year, work_month, step_no, value), counts in totals.items():
+        fields = {}
+        if DIMENSION_COLUMNS[dimension] is not None:
+            fields[DIMENSION_COLUMNS[dimension][1]] = value
+        rollups.append(
+            StepKpiRollup(
+                dimension=dimension,
+                work_year=work_year,
+                work_month=work_month,
+                step_no=step_no,
+                refreshed_at=refreshed_at,
+                **fields,
+                **counts
+            )
+        )
+    return rollups
+
+
+def _replace_periods(periods):
+    rollups = compute_rollups(periods)
+    StepKpiRollup.objects.filter(_periods_q(periods)).delete()
+    StepKpiRollup.objects.bulk_create(rollups, batch_size=500)
+    return len(rollups)
+
+
+def refresh_rollups(full=False):
+    # Returns (periods recomputed, rollup rows written).
+    if full:
+        with transaction.atomic():
+            KpiStalePeriod.objects.all().delete()
+            rollups = compute_rollups()
+            StepKpiRollup.objects.all().delete()
+            StepKpiRollup.objects.bulk_create(rollups, batch_size=500)
+        return len({(rollup.work_year, rollup.work_month) for rollup in rollups}), len(rollups)
+
+    stale = list(KpiStalePeriod.objects.order_by("work_year", "work_month"))
+    written = 0
+    for start in range(0, len(stale), REFRESH_PERIOD_CHUNK):
+        chunk = stale[start : start + REFRESH_PERIOD_CHUNK]
+        with transaction.atomic():
+            # Clear the marks first: a write landing while this runs marks
+            # its period again and is picked up next time.
+            KpiStalePeriod.objects.filter(pk__in=[period.pk for period in chunk]).delete()
+            written += _replace_periods(
+                [(period.work_year, period.work_month) for period in chunk]
+            )
+    return len(stale), written
+
+
+def kpi_report(dimension, work_year=None, step_no=None):
+    rollups = StepKpiRollup.objects.filter(dimension=dimension)
+    if work_year is not None:
+        rollups = rollups.filter(work_year=work_year)
+    if step_no is not None:
+        rollups = rollups.filter(step_no=step_no)
+    if dimension == Dimension.MONTH:
+        fields = ("work_year", "work_month")
+    elif dimension == Dimension.REGION:
+        fields = ("customer_region",)
+    else:
+        fields = ("user", "user__english_name", "user__username")
+    rows = list(
+        rollups.values(*fields)
+        .annotate(**{counter: Sum(counter) for counter in COUNTERS})
+        .order_by(*fields)
+    )
+    for row in rows:
+        judged = row["closed_on_time"] + row["closed_late"]
+        row["on_time_rate"] = row["closed_on_time"] / judged if judged else None
+    return rows
+
+
+def status():
+    return {
+        "refreshed_at": StepKpiRollup.objects.aggregate(latest=Max("refreshed_at"))["latest"],
+        "stale_periods": KpiStalePeriod.objects.count(),
+        "years": list(
+            StepKpiRollup.objects.filter(dimension=Dimension.MONTH)
+            .order_by("-work_year")
+            .values_list("work_year", flat=True)
+            .distinct()
+        ),
+    }
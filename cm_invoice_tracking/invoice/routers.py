@@ -0,0 +1,95 @@
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set on the response after a write; while it is fresh, the next requests
+# (typically the redirect after a save) keep reading from the primary.
+PIN_COOKIE = "invoice_pin_primary"
+SAFE_METHODS = {"GET", "HEAD"}
+
+_state = threading.local()
+
+
+def read_alias():
+    return getattr(settings, "READ_DATABASE_ALIAS", DEFAULT_DB_ALIAS)
+
+
+def reset(pinned=False):
+    _state.use_replica = False
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def use_replica_for(request):
+    # Only GET/HEAD: anything else may write. Lasts for the rest of the
+    # request, template rendering included.
+    if request.method in SAFE_METHODS:
+        _state.use_replica = True
+
+
+def wrote():
+    return getattr(_state, "wrote", False)
+
+
+def reads_alias():
+    # Where a read issued right now goes; for querysets evaluated after the
+    # request returns, such as streamed exports, bind this with .using().
+    if getattr(_state, "use_replica", False) and not getattr(_state, "pinned", False):
+        return read_alias()
+    return DEFAULT_DB_ALIAS
+
+
+def replica_reads(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        use_replica_for(request)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return reads_alias()
+
+    def db_for_write(self, model, **hints):
+        # Pin the rest of the request to the primary so it reads its own writes.
+        _state.pinned = True
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary.
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned_until = request.COOKIES.get(PIN_COOKIE, "")
+        reset(pinned=pinned_until.isdigit() and int(pinned_until) > time.time())
+        try:
+            response = self.get_response(request)
+            # GETs route through db_for_write too (the change form's atomic
+            # block), so only unsafe methods extend the pin past the request.
+            unsafe = request.method not in SAFE_METHODS
+            if wrote() and unsafe and read_alias() != DEFAULT_DB_ALIAS:
+                seconds = settings.READ_REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    PIN_COOKIE,
+                    str(int(time.time() + seconds)),
+                    max_age=seconds,
+                    httponly=True,
+                    samesite="Lax",
+                )
+            return response
+        finally:
+            reset()
@@ -0,0 +1,199 @@
+from django.db import OperationalError, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+from invoice.models import Customer
+
+FTS_TABLE = "invoice_customer_fts"
+FTS_TRIGGERS = {
+    "invoice_customer_fts_insert": """
+        CREATE TRIGGER IF NOT EXISTS invoice_customer_fts_insert
+        AFTER INSERT ON invoice_customer BEGIN
+            INSERT INTO invoice_customer_fts (rowid, ile, round_location)
+            VALUES (new.id, new.ile, new.round_location);
+        END
+    """,
+    "invoice_customer_fts_delete": """
+        CREATE TRIGGER IF NOT EXISTS invoice_customer_fts_delete
+        AFTER DELETE ON invoice_customer BEGIN
+            INSERT INTO invoice_customer_fts (invoice_customer_fts, rowid, ile, round_location)
+            VALUES ('delete', old.id, old.ile, old.round_location);
+        END
+    """,
+    "invoice_customer_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS invoice_customer_fts_update
+        AFTER UPDATE OF ile, round_location ON invoice_customer BEGIN
+            INSERT INTO invoice_customer_fts (invoice_customer_fts, rowid, ile, round_location)
+            VALUES ('delete', old.id, old.ile, old.round_location);
+            INSERT INTO invoice_customer_fts (rowid, ile, round_location)
+            VALUES (new.id, new.ile, new.round_location);
+        END
+    """,
+}
+# The trigram tokenizer cannot match terms shorter than this.
+TRIGRAM_LENGTH = 3
+
+PG_TRGM_INDEXES = {
+    "customer_ile_trgm_idx": "ile",
+    "customer_round_location_trgm_idx": "round_location",
+}
+MSSQL_CATALOG = "invoice_search_catalog"
+
+_available = set()
+
+
+def install(connection):
+    # Runs from post_migrate rather than a migration: SQLite table remakes in
+    # later migrations drop the triggers, and SQL Server full-text DDL cannot
+    # run inside the transaction a migration is wrapped in.
+    if connection.vendor == "sqlite":
+        _install_sqlite(connection)
+    elif connection.vendor == "postgresql":
+        _install_postgresql(connection)
+    elif connection.vendor == "microsoft":
+        _install_mssql(connection)
+    _available.discard(connection.alias)
+
+
+def _sqlite_objects(cursor):
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ({})".format(
+            ", ".join(["%s"] * (len(FTS_TRIGGERS) + 1))
+        ),
+        [FTS_TABLE] + list(FTS_TRIGGERS),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _install_sqlite(connection):
+    with connection.cursor() as cursor:
+        if _sqlite_objects(cursor) == {FTS_TABLE} | set(FTS_TRIGGERS):
+            return
+        # External-content table: the text lives in invoice_customer and the
+        # triggers keep the index in step with every insert, update and delete,
+        # including bulk_create/bulk_update from the importer.
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5("
+                "ile, round_location, content='invoice_customer', content_rowid='id', "
+                "tokenize='trigram')".format(FTS_TABLE)
+            )
+        except OperationalError:
+            # SQLite built without FTS5 or older than 3.34 (no trigram
+            # tokenizer): searches keep using icontains.
+            return
+        for sql in FTS_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute("INSERT INTO {0} ({0}) VALUES ('rebuild')".format(FTS_TABLE))
+
+
+def _install_postgresql(connection):
+    # icontains compiles to UPPER(col::text) LIKE UPPER(...), which a trigram
+    # GIN index over the same expression can serve.
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, column in PG_TRGM_INDEXES.items():
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS {} ON invoice_customer "
+                'USING gin ((UPPER("{}"::text)) gin_trgm_ops)'.format(name, column)
+            )
+
+
+def _install_mssql(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT FULLTEXTSERVICEPROPERTY('IsFullTextInstalled')")
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            "IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = %s) "
+            "CREATE FULLTEXT CATALOG {}".format(MSSQL_CATALOG),
+            [MSSQL_CATALOG],
+        )
+        cursor.execute(
+            "SELECT 1 FROM sys.fulltext_indexes "
+            "WHERE object_id = OBJECT_ID('invoice_customer')"
+        )
+        if cursor.fetchone():
+            return
+        cursor.execute(
+            "SELECT name FROM sys.indexes "
+            "WHERE object_id = OBJECT_ID('invoice_customer') AND is_primary_key = 1"
+        )
+        key_index = cursor.fetchone()[0]
+        cursor.execute(
+            "CREATE FULLTEXT INDEX ON invoice_customer (ile, round_location) "
+            "KEY INDEX [{}] ON {} WITH CHANGE_TRACKING AUTO".format(key_index, MSSQL_CATALOG)
+        )
+
+
+def is_available(using="default"):
+    if using in _available:
+        return True
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            found = _sqlite_objects(cursor) == {FTS_TABLE} | set(FTS_TRIGGERS)
+        elif connection.vendor == "microsoft":
+            cursor.execute(
+                "SELECT 1 FROM sys.fulltext_indexes "
+                "WHERE object_id = OBJECT_ID('invoice_customer')"
+            )
+            found = cursor.fetchone() is not None
+        else:
+            # PostgreSQL's trigram indexes serve plain icontains lookups.
+            found = False
+    if found:
+        _available.add(using)
+    return found
+
+
+def search_words(search_term):
+    # Split the same way ModelAdmin.get_search_results does.
+    words = []
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit:
+            words.append(bit)
+    return words
+
+
+def _phrase(word):
+    return '"{}"'.format(word.replace('"', '""'))
+
+
+def matching_customers(search_term, using="default"):
+    # Every word has to appear in the ILE or the round location, as with the
+    # icontains search_fields this replaces.
+    customers = Customer.objects.using(using).all()
+    words = search_words(search_term)
+    if not words or not is_available(using):
+        for word in words:
+            customers = customers.filter(
+                Q(ile__icontains=word) | Q(round_location__icontains=word)
+            )
+        return customers
+
+    vendor = connections[using].vendor
+    if vendor == "sqlite":
+        indexed = [word for word in words if len(word) >= TRIGRAM_LENGTH]
+        if indexed:
+            customers = customers.filter(
+                pk__in=RawSQL(
+                    "SELECT rowid FROM {0} WHERE {0} MATCH %s".format(FTS_TABLE),
+                    [" AND ".join(_phrase(word) for word in indexed)],
+                )
+            )
+        for word in words:
+            if len(word) < TRIGRAM_LENGTH:
+                customers = customers.filter(
+                    Q(ile__icontains=word) | Q(round_location__icontains=word)
+                )
+        return customers
+
+    # SQL Server full-text matches word prefixes rather than arbitrary substrings.
+    return customers.extra(
+        where=["CONTAINS((ile, round_location), %s)"],
+        params=[" AND ".join('"{}*"'.format(word.replace('"', '""')) for word in words)],
+    )
@@ -1,55 +1,40 @@
-import calendar
-from datetime import date
+import time
+from datetime import timedelta
 
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, Max, Min, OuterRef, Q, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from invoice.models import Customer, CustomerStepRule, Work, WorkStep
+from invoice import dashboard_cache, reporting
+from invoice.due_dates import compute_planned_due_dates, due_date_for, next_month, rule_key
+from invoice.models import (
+    ArchivedWork,
+    ArchivedWorkStep,
+    Customer,
+    CustomerStepRule,
+    GenerationJob,
+    User,
+    Work,
+    WorkStep,
+)
 
-
-def _month_last_day(year, month):
-    return calendar.monthrange(year, month)[1]
-
-
-def _next_month(year, month):
-    if month == 12:
-        return year + 1, 1
-    return year, month + 1
+BULK_BATCH_SIZE = 500
 
 
 def compute_planned_due_date(rule, period_year, period_month):
-    if rule is None or rule.rule_type == CustomerStepRule.RuleType.NO_RULE:
-        return None
-
-    if rule.rule_type == CustomerStepRule.RuleType.THIS_MONTH_DAY:
-        last_day = _month_last_day(period_year, period_month)
-        day = min(rule.day_of_month, last_day)
-        return date(period_year, period_month, day)
-
-    if rule.rule_type == CustomerStepRule.RuleType.NEXT_MONTH_DAY:
-        next_year, next_month = _next_month(period_year, period_month)
-        last_day = _month_last_day(next_year, next_month)
-        day = min(rule.day_of_month, last_day)
-        return date(next_year, next_month, day)
-
-    if rule.rule_type == CustomerStepRule.RuleType.THIS_MONTH_NTH_WEEKDAY:
-        days_in_month = _month_last_day(period_year, period_month)
-        matches = []
-        for day in range(1, days_in_month + 1):
-            if date(period_year, period_month, day).weekday() == rule.weekday:
-                matches.append(day)
-        if not matches:
-            return None
-        index = min(rule.nth, len(matches)) - 1
-        return date(period_year, period_month, matches[index])
-
-    if rule.rule_type == CustomerStepRule.RuleType.THIS_MONTH_LAST_NTH_DAY:
-        last_day = _month_last_day(period_year, period_month)
-        day = last_day - (rule.last_nth - 1)
-        if day < 1:
-            day = 1
-        return date(period_year, period_month, day)
+    return due_date_for(*rule_key(rule), period_year, period_month)
 
-    return None
+
+def touch_works(work_ids, now=None):
+    # Work.updated_at also moves when a step changes, so the overview's
+    # conditional GET only has to look at the works.
+    work_ids = list(work_ids)
+    for start in range(0, len(work_ids), BULK_BATCH_SIZE):
+        Work.objects.filter(pk__in=work_ids[start : start + BULK_BATCH_SIZE]).update(
+            updated_at=now or timezone.now()
+        )
 
 
 def ensure_steps_for_work(work):
@@ -83,41 +68,589 @@ def ensure_work_for_customer(customer, work_year, work_month):
     return work
 
 
-def bulk_ensure_work_for_month(work_year, work_month, scoped_customers=None):
-    created_count = 0
-    existed_count = 0
-    steps_created_count = 0
+def _customer_scope_filter(customers, prefix=""):
+    if isinstance(customers, QuerySet):
+        return {"{}customer__in".format(prefix): customers.values("pk")}
+    return {}
+
 
+def rules_by_customer(customers):
+    rules = CustomerStepRule.objects.all()
+    if isinstance(customers, QuerySet):
+        rules = rules.filter(customer__in=customers.values("pk"))
+    grouped = {}
+    for rule in rules:
+        grouped.setdefault(rule.customer_id, {})[rule.step_no] = rule
+    return grouped
+
+
+def bulk_ensure_work_for_month(work_year, work_month, scoped_customers=None):
     customers = scoped_customers if scoped_customers is not None else Customer.objects.all()
+    if isinstance(customers, QuerySet):
+        customers = customers.select_related("responsible_lcm")
+    customers = list(customers)
+    if not customers:
+        return 0, 0, 0
+    customer_ids = {customer.pk for customer in customers}
 
     with transaction.atomic():
-        for customer in customers:
-            work, created = Work.objects.get_or_create(
-                customer=customer,
+        existing_work_ids = {
+            customer_id: work_id
+            for work_id, customer_id in Work.objects.filter(
                 work_year=work_year,
                 work_month=work_month,
+                **_customer_scope_filter(scoped_customers)
+            ).values_list("id", "customer_id")
+            if customer_id in customer_ids
+        }
+        rules = rules_by_customer(scoped_customers)
+
+        new_works = []
+        for customer in customers:
+            if customer.pk in existing_work_ids:
+                continue
+            new_works.append(
+                Work(
+                    customer=customer,
+                    work_year=work_year,
+                    work_month=work_month,
+                    customer_region=customer.region,
+                    assigned_cm_id=customer.responsible_cm_id,
+                    assigned_lcm_id=customer.responsible_lcm_id,
+                    assigned_lcm_scnx=getattr(customer.responsible_lcm, "scnx", None),
+                )
             )
-            if created:
-                created_count += 1
-            else:
-                existed_count += 1
-
-            rules_by_step = {
-                rule.step_no: rule
-                for rule in CustomerStepRule.objects.filter(customer=customer)
+        Work.objects.bulk_create(new_works, batch_size=BULK_BATCH_SIZE)
+
+        if new_works:
+            # SQLite does not hand back primary keys from bulk_create on Django 3.2.
+            work_customer_ids = {
+                work_id: customer_id
+                for work_id, customer_id in Work.objects.filter(
+                    work_year=work_year,
+                    work_month=work_month,
+                    **_customer_scope_filter(scoped_customers)
+                ).values_list("id", "customer_id")
+                if customer_id in customer_ids
+            }
+        else:
+            work_customer_ids = {
+                work_id: customer_id for customer_id, work_id in existing_work_ids.items()
             }
 
-            for step_no in range(1, 5):
-                step, step_created = WorkStep.objects.get_or_create(
-                    work=work, step_no=step_no
-                )
-                if step_created:
-                    steps_created_count += 1
-                if step.planned_due_date is None:
-                    rule = rules_by_step.get(step_no)
-                    step.planned_due_date = compute_planned_due_date(
-                        rule, work_year, work_month
+        existing_steps = {}
+        for step in WorkStep.objects.filter(
+            work__work_year=work_year,
+            work__work_month=work_month,
+            **_customer_scope_filter(scoped_customers, prefix="work__")
+        ).only("id", "work_id", "step_no", "planned_due_date"):
+            existing_steps[(step.work_id, step.step_no)] = step
+
+        new_steps = []
+        steps_to_update = []
+        for work_id, customer_id in work_customer_ids.items():
+            customer_rules = rules.get(customer_id, {})
+            due_dates = compute_planned_due_dates(
+                [customer_rules.get(step_no) for step_no in range(1, 5)],
+                work_year,
+                work_month,
+            )
+            for step_no, planned_due_date in enumerate(due_dates, start=1):
+                step = existing_steps.get((work_id, step_no))
+                if step is not None and step.planned_due_date is not None:
+                    continue
+                if step is None:
+                    new_steps.append(
+                        WorkStep(
+                            work_id=work_id,
+                            step_no=step_no,
+                            planned_due_date=planned_due_date,
+                        )
                     )
-                    step.save()
+                elif planned_due_date is not None:
+                    step.planned_due_date = planned_due_date
+                    steps_to_update.append(step)
+        WorkStep.objects.bulk_create(new_steps, batch_size=BULK_BATCH_SIZE)
+        now = timezone.now()
+        for step in steps_to_update:
+            step.updated_at = now
+        WorkStep.objects.bulk_update(
+            steps_to_update, ["planned_due_date", "updated_at"], batch_size=BULK_BATCH_SIZE
+        )
+        # New works got their timestamp on insert; existing ones that gained
+        # or re-dated steps are bumped here.
+        touch_works(
+            {step.work_id for step in new_steps + steps_to_update}
+            & set(existing_work_ids.values()),
+            now,
+        )
+        if new_works or new_steps or steps_to_update:
+            # bulk_create/bulk_update bypass the model signals.
+            dashboard_cache.invalidate_all_on_commit()
+            reporting.mark_stale([(work_year, work_month)])
+
+    created_count = len(new_works)
+    existed_count = len(customers) - created_count
+    # As before the set-based rewrite: steps of new works come with the work
+    # and are not counted, only steps backfilled onto works that existed.
+    existing = set(existing_work_ids.values())
+    steps_created = sum(1 for step in new_steps if step.work_id in existing)
+    return created_count, existed_count, steps_created
+
+
+def iter_months(start, end):
+    year, month = start
+    while (year, month) <= end:
+        yield year, month
+        year, month = next_month(year, month)
+
+
+def customer_shards(shard_count, customers=None):
+    customers = customers if customers is not None else Customer.objects.all()
+    pks = list(customers.order_by("pk").values_list("pk", flat=True))
+    if not pks:
+        return []
+    size = -(-len(pks) // max(shard_count, 1))
+    shards = []
+    for start in range(0, len(pks), size):
+        chunk = pks[start : start + size]
+        shards.append((chunk[0], chunk[-1]))
+    return shards
+
+
+def generate_shard(work_year, work_month, first_pk, last_pk):
+    scoped = Customer.objects.filter(pk__gte=first_pk, pk__lte=last_pk)
+    return bulk_ensure_work_for_month(work_year, work_month, scoped)
+
+
+JOB_CHUNK_SIZE = 500
+JOB_STALE_SECONDS = 600
+
+
+def enqueue_generation(work_year, work_month, user=None):
+    # Returns (job, created); a month that is already queued or running hands
+    # back the existing job instead of starting a second one.
+    active = GenerationJob.objects.filter(
+        work_year=work_year, work_month=work_month, status__in=GenerationJob.ACTIVE_STATUSES
+    )
+    job = active.first()
+    if job is not None:
+        return job, False
+    try:
+        with transaction.atomic():
+            job = GenerationJob.objects.create(
+                work_year=work_year, work_month=work_month, requested_by=user
+            )
+    except IntegrityError:
+        # Lost the race to a concurrent submit; uniq_active_generation_job
+        # guarantees the other job is there.
+        return active.get(), False
+    return job, True
+
+
+def claim_generation_job():
+    stale_before = timezone.now() - timedelta(seconds=JOB_STALE_SECONDS)
+    candidates = GenerationJob.objects.filter(
+        Q(status=GenerationJob.Status.QUEUED)
+        | Q(status=GenerationJob.Status.RUNNING, heartbeat_at__lt=stale_before)
+    ).order_by("created_at", "pk")
+    for job in candidates[:5]:
+        now = timezone.now()
+        # Compare-and-set on the status/heartbeat read above, so two workers
+        # never take the same job.
+        claimed = GenerationJob.objects.filter(
+            pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at
+        ).update(status=GenerationJob.Status.RUNNING, started_at=now, heartbeat_at=now)
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_generation_job(job, chunk_size=JOB_CHUNK_SIZE):
+    # Customers are generated in pk-range chunks, each in its own short
+    # transaction, so the write lock is released between chunks and progress
+    # is visible while the job runs. Re-running a chunk is a no-op, which is
+    # what makes taking over a stale job safe.
+    pks = list(Customer.objects.order_by("pk").values_list("pk", flat=True))
+    GenerationJob.objects.filter(pk=job.pk).update(
+        total_customers=len(pks),
+        processed_customers=0,
+        works_created=0,
+        works_existed=0,
+        steps_created=0,
+    )
+    try:
+        for start in range(0, len(pks), chunk_size):
+            chunk = pks[start : start + chunk_size]
+            created, existed, steps_created = generate_shard(
+                job.work_year, job.work_month, chunk[0], chunk[-1]
+            )
+            GenerationJob.objects.filter(pk=job.pk).update(
+                processed_customers=F("processed_customers") + len(chunk),
+                works_created=F("works_created") + created,
+                works_existed=F("works_existed") + existed,
+                steps_created=F("steps_created") + steps_created,
+                heartbeat_at=timezone.now(),
+            )
+    except Exception as exc:
+        GenerationJob.objects.filter(pk=job.pk).update(
+            status=GenerationJob.Status.FAILED, error=str(exc), finished_at=timezone.now()
+        )
+        raise
+    GenerationJob.objects.filter(pk=job.pk).update(
+        status=GenerationJob.Status.DONE, finished_at=timezone.now()
+    )
+    job.refresh_from_db()
+    return job
+
+
+REASSIGN_CHUNK_SIZE = 5000
+
+BN_ISSUE_STATUSES = [
+    status for status in Work.BNReleaseStatus.values if status != Work.BNReleaseStatus.FULL
+]
+
+CUSTOMER_SNAPSHOT_SOURCES = {
+    "customer_region": "customer__region",
+    "assigned_cm": "customer__responsible_cm",
+    "assigned_lcm": "customer__responsible_lcm",
+    "assigned_lcm_scnx": "customer__responsible_lcm__scnx",
+}
+
+
+def open_works(queryset=None):
+    queryset = queryset if queryset is not None else Work.objects.all()
+    open_step_work_ids = WorkStep.objects.filter(
+        step_status=WorkStep.StepStatus.OPEN
+    ).values("work_id")
+    return queryset.filter(
+        Q(bn_release_status__in=BN_ISSUE_STATUSES) | Q(pk__in=open_step_work_ids)
+    )
+
+
+def _differs(field, source):
+    # NULL on both sides counts as equal, unlike a bare ~Q(field=F(source)).
+    return ~Q(**{field: F(source)}) & ~Q(
+        **{"{}__isnull".format(field): True, "{}__isnull".format(source): True}
+    )
+
+
+def _chunked_update(queryset, chunk_size, **values):
+    bounds = queryset.aggregate(first_pk=Min("pk"), last_pk=Max("pk"))
+    if bounds["first_pk"] is None:
+        return 0
+    touched = 0
+    for start in range(bounds["first_pk"], bounds["last_pk"] + 1, chunk_size):
+        with transaction.atomic():
+            touched += queryset.filter(pk__gte=start, pk__lt=start + chunk_size).update(
+                updated_at=timezone.now(), **values
+            )
+    return touched
+
+
+def reassign_open_works(customers=None, chunk_size=REASSIGN_CHUNK_SIZE):
+    started = time.perf_counter()
+    works = open_works()
+    if customers is not None:
+        customer_ids = customers.values("pk") if isinstance(customers, QuerySet) else customers
+        works = works.filter(customer__in=customer_ids)
+
+    stale = Q()
+    for field, source in CUSTOMER_SNAPSHOT_SOURCES.items():
+        stale |= _differs(field, source)
+    # The KPI rollups group by assignee and region, so note the periods first.
+    periods = set(works.filter(stale).values_list("work_year", "work_month").distinct())
+    customer = Customer.objects.filter(pk=OuterRef("customer_id"))
+    touched = _chunked_update(
+        works.filter(stale),
+        chunk_size,
+        **{
+            field: Subquery(customer.values(source.split("__", 1)[1])[:1])
+            for field, source in CUSTOMER_SNAPSHOT_SOURCES.items()
+        }
+    )
+    if touched:
+        dashboard_cache.invalidate_all_on_commit()
+        reporting.mark_stale(periods)
+    return touched, time.perf_counter() - started
+
+
+def propagate_lcm_scnx(users=None, chunk_size=REASSIGN_CHUNK_SIZE):
+    started = time.perf_counter()
+    works = open_works().filter(assigned_lcm__isnull=False)
+    if users is not None:
+        user_ids = users.values("pk") if isinstance(users, QuerySet) else users
+        works = works.filter(assigned_lcm__in=user_ids)
+
+    touched = _chunked_update(
+        works.filter(_differs("assigned_lcm_scnx", "assigned_lcm__scnx")),
+        chunk_size,
+        assigned_lcm_scnx=Subquery(
+            User.objects.filter(pk=OuterRef("assigned_lcm_id")).values("scnx")[:1]
+        ),
+    )
+    if touched:
+        dashboard_cache.invalidate_all_on_commit()
+    return touched, time.perf_counter() - started
+
+
+def set_step_status(steps, step_status, today=None):
+    # One UPDATE for the whole selection, with WorkStep.save's rule that
+    # closing stamps actual_closed_date only when it is still empty. Callers
+    # pass a queryset already limited to the works the user may see.
+    today = today or timezone.localdate()
+    steps = steps.exclude(step_status=step_status)
+    now = timezone.now()
+    values = {"step_status": step_status, "updated_at": now}
+    if step_status == WorkStep.StepStatus.CLOSED:
+        values["actual_closed_date"] = Coalesce("actual_closed_date", Value(today))
+    works = list(
+        Work.objects.filter(pk__in=steps.values("work_id")).values_list(
+            "pk", "assigned_cm_id", "assigned_lcm_id", "work_year", "work_month"
+        )
+    )
+    touched = steps.update(**values)
+    if touched:
+        touch_works([work[0] for work in works], now)
+        # update() bypasses the post_save receivers.
+        dashboard_cache.invalidate_users_on_commit(
+            {user_id for _, cm_id, lcm_id, _, _ in works for user_id in (cm_id, lcm_id)}
+        )
+        reporting.mark_stale({(year, month) for _, _, _, year, month in works})
+    return touched
+
+
+def delete_steps(steps):
+    # WorkStep has no delete receivers so customer and work cascades can
+    # fast-delete their steps; deleting steps on their own goes through here
+    # to refresh what those receivers would have.
+    works = list(
+        Work.objects.filter(pk__in=steps.values("work_id")).values_list(
+            "pk", "assigned_cm_id", "assigned_lcm_id", "work_year", "work_month"
+        )
+    )
+    deleted, _ = steps.delete()
+    if deleted:
+        touch_works([work[0] for work in works])
+        user_ids = {user_id for _, cm_id, lcm_id, _, _ in works for user_id in (cm_id, lcm_id)}
+        dashboard_cache.invalidate_users_on_commit(user_ids)
+        reporting.mark_stale({(year, month) for _, _, _, year, month in works})
+    return deleted
+
+
+REPLAN_CHUNK_SIZE = 500
+
+
+def replan_open_steps(customer_ids, step_nos=None, today=None, protect_overridden=None):
+    # Recompute planned_due_date from the customers' current rules for OPEN
+    # steps in the current and future periods: one read of the steps, one of
+    # the rules, and a bulk_update of the dates that actually moved.
+    today = today or timezone.localdate()
+    if protect_overridden is None:
+        protect_overridden = settings.REPLAN_PROTECT_OVERRIDDEN_DATES
+    customer_ids = list(customer_ids)
+    steps = WorkStep.objects.filter(
+        ~before_period(today.year, today.month, prefix="work__"),
+        step_status=WorkStep.StepStatus.OPEN,
+        work__customer_id__in=customer_ids,
+    )
+    if step_nos is not None:
+        steps = steps.filter(step_no__in=step_nos)
+    if protect_overridden:
+        steps = steps.filter(due_date_overridden=False)
+    rules = {
+        (rule.customer_id, rule.step_no): rule
+        for rule in CustomerStepRule.objects.filter(customer_id__in=customer_ids)
+    }
+
+    changed = []
+    user_ids = set()
+    periods = set()
+    now = timezone.now()
+    for step in steps.select_related("work").only(
+        "step_no",
+        "planned_due_date",
+        "due_date_overridden",
+        "work__customer_id",
+        "work__work_year",
+        "work__work_month",
+        "work__assigned_cm_id",
+        "work__assigned_lcm_id",
+    ):
+        work = step.work
+        planned_due_date = due_date_for(
+            *rule_key(rules.get((work.customer_id, step.step_no))),
+            work.work_year,
+            work.work_month,
+        )
+        # Like generation, a step without a rule keeps the date it has.
+        if planned_due_date is None or planned_due_date == step.planned_due_date:
+            continue
+        step.planned_due_date = planned_due_date
+        step.due_date_overridden = False
+        step.updated_at = now
+        changed.append(step)
+        user_ids.update([work.assigned_cm_id, work.assigned_lcm_id])
+        periods.add((work.work_year, work.work_month))
+    WorkStep.objects.bulk_update(
+        changed,
+        ["planned_due_date", "due_date_overridden", "updated_at"],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    touch_works({step.work_id for step in changed}, now)
+    if changed:
+        # bulk_update bypasses the post_save receivers.
+        dashboard_cache.invalidate_users_on_commit(user_ids)
+        reporting.mark_stale(periods)
+    return len(changed)
+
+
+def replan_all_customers(chunk_size=REPLAN_CHUNK_SIZE, protect_overridden=None):
+    customer_ids = list(Customer.objects.order_by("pk").values_list("pk", flat=True))
+    replanned = 0
+    for start in range(0, len(customer_ids), chunk_size):
+        with transaction.atomic():
+            replanned += replan_open_steps(
+                customer_ids[start : start + chunk_size],
+                protect_overridden=protect_overridden,
+            )
+    return replanned
+
 
-    return created_count, existed_count, steps_created_count
+ARCHIVE_CHUNK_SIZE = 500
+
+
+def archive_cutoff(today, months):
+    # First period that stays hot: works strictly before it may be archived.
+    index = today.year * 12 + today.month - 1 - months
+    return index // 12, index % 12 + 1
+
+
+def before_period(work_year, work_month, prefix=""):
+    return Q(**{prefix + "work_year__lt": work_year}) | Q(
+        **{prefix + "work_year": work_year, prefix + "work_month__lt": work_month}
+    )
+
+
+def closed_works(queryset=None):
+    # BN fully released and every step closed: the complement of open_works.
+    queryset = queryset if queryset is not None else Work.objects.all()
+    open_step_work_ids = WorkStep.objects.filter(
+        step_status=WorkStep.StepStatus.OPEN
+    ).values("work_id")
+    return queryset.filter(bn_release_status=Work.BNReleaseStatus.FULL).exclude(
+        pk__in=open_step_work_ids
+    )
+
+
+HOT_MODELS = (Work, WorkStep)
+
+
+def _copy_rows(source, target, key_column, ids, archived_at=None):
+    # INSERT ... SELECT, so rows never round-trip through Python. Both tables
+    # share the hot model's columns; archived_at only exists on the archive.
+    qn = connection.ops.quote_name
+    hot = source if source in HOT_MODELS else target
+    columns = [qn(field.column) for field in hot._meta.concrete_fields]
+    target_columns = list(columns)
+    source_columns = list(columns)
+    params = []
+    if archived_at is not None:
+        target_columns.append(qn("archived_at"))
+        source_columns.append("%s")
+        params.append(archived_at)
+    table = qn(target._meta.db_table)
+    # The hot tables have identity keys that SQL Server will not take ids for
+    # unless asked; SQLite and PostgreSQL accept them as they are.
+    identity_insert = connection.vendor == "microsoft" and target in HOT_MODELS
+    with connection.cursor() as cursor:
+        if identity_insert:
+            cursor.execute("SET IDENTITY_INSERT {} ON".format(table))
+        cursor.execute(
+            "INSERT INTO {} ({}) SELECT {} FROM {} WHERE {} IN ({})".format(
+                table,
+                ", ".join(target_columns),
+                ", ".join(source_columns),
+                qn(source._meta.db_table),
+                qn(key_column),
+                ", ".join(["%s"] * len(ids)),
+            ),
+            params + ids,
+        )
+        copied = cursor.rowcount
+        if identity_insert:
+            cursor.execute("SET IDENTITY_INSERT {} OFF".format(table))
+    return copied
+
+
+def _delete_rows(model, key_column, ids):
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM {} WHERE {} IN ({})".format(
+                qn(model._meta.db_table), qn(key_column), ", ".join(["%s"] * len(ids))
+            ),
+            ids,
+        )
+
+
+def _move_in_chunks(queryset, move_chunk, chunk_size):
+    moved_works = moved_steps = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            moved_steps += move_chunk(ids)
+        moved_works += len(ids)
+        last_pk = ids[-1]
+    if moved_works:
+        # Raw SQL bypasses the model signals.
+        dashboard_cache.invalidate_all_on_commit()
+    return moved_works, moved_steps
+
+
+def archive_works(before_year, before_month, chunk_size=ARCHIVE_CHUNK_SIZE):
+    archived_at = timezone.now()
+
+    def move_chunk(ids):
+        # Parents are copied before their steps and deleted after them, so the
+        # foreign keys hold at every statement.
+        _copy_rows(Work, ArchivedWork, "id", ids, archived_at)
+        steps = _copy_rows(WorkStep, ArchivedWorkStep, "work_id", ids)
+        _delete_rows(WorkStep, "work_id", ids)
+        _delete_rows(Work, "id", ids)
+        return steps
+
+    works = closed_works(Work.objects.filter(before_period(before_year, before_month)))
+    return _move_in_chunks(works, move_chunk, chunk_size)
+
+
+def restore_archived_works(archived_works, chunk_size=ARCHIVE_CHUNK_SIZE):
+    # Works regenerated for the same customer and period since archiving
+    # keep their place; those archived rows stay archived and are reported.
+    conflicting = Work.objects.filter(
+        customer_id=OuterRef("customer_id"),
+        work_year=OuterRef("work_year"),
+        work_month=OuterRef("work_month"),
+    )
+    archived_works = archived_works.annotate(conflict=Exists(conflicting))
+
+    def move_chunk(ids):
+        _copy_rows(ArchivedWork, Work, "id", ids)
+        steps = _copy_rows(ArchivedWorkStep, WorkStep, "work_id", ids)
+        _delete_rows(ArchivedWorkStep, "work_id", ids)
+        _delete_rows(ArchivedWork, "id", ids)
+        return steps
+
+    skipped = archived_works.filter(conflict=True).count()
+    restored, steps = _move_in_chunks(
+        archived_works.filter(conflict=False), move_chunk, chunk_size
+    )
+    return restored, steps, skipped
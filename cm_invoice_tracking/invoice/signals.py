@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from invoice import dashboard_cache, reporting, search
+from invoice.models import Customer, CustomerStepRule, User, Work, WorkStep
+
+
+def _assignees(work):
+    # Read from __dict__ so deferred fields are never loaded just for this.
+    return [work.__dict__.get("assigned_cm_id"), work.__dict__.get("assigned_lcm_id")]
+
+
+def _customer_assignees(customer_id):
+    user_ids = set()
+    rows = (
+        Work.objects.filter(customer_id=customer_id)
+        .values_list("assigned_cm_id", "assigned_lcm_id")
+        .distinct()
+    )
+    for cm_id, lcm_id in rows:
+        user_ids.update([cm_id, lcm_id])
+    return user_ids
+
+
+@receiver(post_save, sender=Work)
+@receiver(post_delete, sender=Work)
+def invalidate_for_work(sender, instance, **kwargs):
+    # Work.save refreshes _loaded_values only after post_save, so it still
+    # holds the assignees the row had before this write.
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    dashboard_cache.invalidate_users_on_commit(
+        _assignees(instance) + [loaded.get("assigned_cm_id"), loaded.get("assigned_lcm_id")]
+    )
+
+
+@receiver(post_save, sender=Work)
+@receiver(post_delete, sender=Work)
+def mark_kpis_for_work(sender, instance, **kwargs):
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    periods = [(instance.work_year, instance.work_month)]
+    if "work_year" in loaded and "work_month" in loaded:
+        periods.append((loaded["work_year"], loaded["work_month"]))
+    reporting.mark_stale(periods)
+
+
+# No post_delete receiver for WorkStep: it would stop customer and work
+# cascades from fast-deleting steps. Those cascades signal for the Work, the
+# Work change form saves the Work, and WorkStepAdmin deletes through
+# services.delete_steps.
+@receiver(post_save, sender=WorkStep)
+def invalidate_for_step(sender, instance, **kwargs):
+    if WorkStep.work.is_cached(instance):
+        user_ids = _assignees(instance.work)
+    else:
+        user_ids = list(
+            Work.objects.filter(pk=instance.work_id)
+            .values_list("assigned_cm_id", "assigned_lcm_id")
+            .first()
+            or []
+        )
+    dashboard_cache.invalidate_users_on_commit(user_ids)
+
+
+@receiver(post_save, sender=WorkStep)
+def mark_kpis_for_step(sender, instance, **kwargs):
+    if WorkStep.work.is_cached(instance):
+        periods = [(instance.work.work_year, instance.work.work_month)]
+    else:
+        periods = Work.objects.filter(pk=instance.work_id).values_list("work_year", "work_month")
+    reporting.mark_stale(periods)
+
+
+@receiver(post_save, sender=WorkStep)
+def touch_work_for_step(sender, instance, **kwargs):
+    # The overview's ETag only reads Work.updated_at; see services.touch_works.
+    Work.objects.filter(pk=instance.work_id).update(updated_at=instance.updated_at)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_for_customer(sender, instance, **kwargs):
+    dashboard_cache.invalidate_users_on_commit(_customer_assignees(instance.pk))
+
+
+@receiver(post_save, sender=CustomerStepRule)
+@receiver(post_delete, sender=CustomerStepRule)
+def invalidate_for_rule(sender, instance, **kwargs):
+    dashboard_cache.invalidate_users_on_commit(_customer_assignees(instance.customer_id))
+
+
+@receiver(post_save, sender=CustomerStepRule)
+def replan_for_rule(sender, instance, **kwargs):
+    from invoice.services import replan_open_steps
+
+    customer_id, step_no = instance.customer_id, instance.step_no
+    transaction.on_commit(lambda: replan_open_steps([customer_id], [step_no]))
+
+
+@receiver(post_save, sender=User)
+def invalidate_for_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    # Users' names appear on other users' overviews too, so every scope goes.
+    dashboard_cache.invalidate_all_on_commit()
+
+
+# Connected in InvoiceConfig.ready for this app's post_migrate only.
+def install_customer_search(sender, using, **kwargs):
+    search.install(connections[using])
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute("PRAGMA {} = {}".format(name, value))
@@ -0,0 +1,276 @@
+import math
+import random
+import re
+import statistics
+import threading
+import time
+from unittest import skipIf, skipUnless
+
+from django.db import OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from invoice import dashboard_cache
+from invoice.admin import overview_querysets, visible_works_for_user
+from invoice.management.commands.seed_perf_data import random_rule
+from invoice.models import Customer, CustomerStepRule, User, Work, WorkStep
+from invoice.services import bulk_ensure_work_for_month
+
+# Keep the tests off the shared file cache the running site uses.
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "dashboard": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "invoice-dashboard-tests",
+    },
+}
+ROLES = [User.Role.ADMIN, User.Role.HOD, User.Role.LCM, User.Role.CM]
+HOT_TABLES = (Work._meta.db_table, WorkStep._meta.db_table)
+FULL_SCAN = re.compile(r"\bSCAN ({})\b".format("|".join(HOT_TABLES)))
+
+
+def previous_month(year, month):
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OverviewQueryCountTests(TestCase):
+    customer_count = 20
+    extra_months = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        cls.users = {
+            role: User.objects.create(
+                username="qcheck_{}".format(role.lower()), role=role, is_staff=True
+            )
+            for role in ROLES
+        }
+        cls.users["superuser"] = User.objects.create(
+            username="qcheck_superuser", is_staff=True, is_superuser=True
+        )
+        cls.customers = [
+            Customer.objects.create(
+                ile="QCHECK{:04d}".format(index),
+                round_location="R0",
+                region=rng.choice(Customer.Region.values),
+                responsible_cm=cls.users[User.Role.CM],
+                responsible_lcm=cls.users[User.Role.LCM],
+            )
+            for index in range(cls.customer_count)
+        ]
+        CustomerStepRule.objects.bulk_create(
+            [
+                random_rule(rng, customer.pk, step_no)
+                for customer in cls.customers
+                for step_no in range(1, 5)
+            ]
+        )
+
+    def login(self, user):
+        self.client.force_login(user)
+        dashboard_cache.invalidate_all()
+
+    def test_overview_query_count_does_not_grow_with_history(self):
+        today = timezone.localdate()
+        period = (today.year, today.month)
+        bulk_ensure_work_for_month(*period, self.customers)
+        small = {}
+        for label, user in self.users.items():
+            self.login(user)
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get("/admin/")
+            self.assertEqual(response.status_code, 200)
+            small[label] = len(captured)
+
+        for _ in range(self.extra_months):
+            period = previous_month(*period)
+            bulk_ensure_work_for_month(*period, self.customers)
+        for label, user in self.users.items():
+            with self.subTest(role=label):
+                self.login(user)
+                with self.assertNumQueries(small[label]):
+                    response = self.client.get("/admin/")
+                self.assertEqual(response.status_code, 200)
+
+
+def plan_for(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def hot_queries():
+    today = timezone.localdate()
+    users = {
+        "superuser": User(pk=1, is_superuser=True),
+        "lcm": User(pk=1, role=User.Role.LCM),
+        "cm": User(pk=1, role=User.Role.CM),
+    }
+    for label, user in users.items():
+        exception_works, upcoming_steps = overview_querysets(user, today)
+        yield "overview exceptions ({})".format(label), exception_works
+        yield "overview upcoming steps ({})".format(label), upcoming_steps
+
+        visible_works = visible_works_for_user(Work.objects.all(), user)
+        yield "work changelist period ({})".format(label), visible_works.filter(
+            work_year=today.year, work_month=today.month
+        )
+        yield "work changelist BN status ({})".format(label), visible_works.filter(
+            bn_release_status=Work.BNReleaseStatus.OPEN
+        )
+        yield "work changelist CM ({})".format(label), visible_works.filter(assigned_cm=user)
+        yield "work changelist LCM ({})".format(label), visible_works.filter(assigned_lcm=user)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN checks require SQLite.")
+class QueryPlanTests(TestCase):
+    def test_hot_queries_do_not_scan_work_tables(self):
+        for label, queryset in hot_queries():
+            with self.subTest(query=label):
+                plan = plan_for(queryset)
+                scans = [line for line in plan if FULL_SCAN.search(line)]
+                self.assertEqual(scans, [], "\n".join(plan))
+
+
+# A period well past any generated history, created and deleted by the writer.
+STRESS_YEAR = 2998
+
+
+def is_lock_error(exc):
+    return "locked" in str(exc) or "busy" in str(exc)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = []
+        self.errors = 0
+        self.other_errors = []
+
+    def record(self, seconds=None, error=None):
+        with self.lock:
+            if error is None:
+                self.timings.append(seconds)
+            elif is_lock_error(error):
+                self.errors += 1
+            else:
+                self.other_errors.append(str(error))
+
+    def summary(self):
+        timings = sorted(self.timings)
+        if not timings:
+            return "0 ok, {} lock errors".format(self.errors)
+        p95 = timings[math.ceil(len(timings) * 0.95) - 1]
+        return "{} ok, {} lock errors, median {:.1f}ms, p95 {:.1f}ms, max {:.1f}ms".format(
+            len(timings),
+            self.errors,
+            statistics.median(timings) * 1000,
+            p95 * 1000,
+            timings[-1] * 1000,
+        )
+
+
+def read_overview(year, month):
+    # Roughly what the overview and the work changelist ask for.
+    works = Work.objects.filter(work_year=year, work_month=month)
+    works.count()
+    list(works.select_related("customer", "assigned_cm", "assigned_lcm").order_by("-pk")[:100])
+
+
+def reader(stop, stats, periods):
+    try:
+        index = 0
+        while not stop.is_set():
+            year, month = periods[index % len(periods)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                read_overview(year, month)
+            except OperationalError as exc:
+                stats.record(error=exc)
+            else:
+                stats.record(time.perf_counter() - started)
+    finally:
+        connections.close_all()
+
+
+def writer(stop, stats, customers):
+    try:
+        month = 0
+        while not stop.is_set():
+            month = month % 12 + 1
+            started = time.perf_counter()
+            try:
+                bulk_ensure_work_for_month(STRESS_YEAR, month, customers)
+                with transaction.atomic():
+                    Work.objects.filter(work_year=STRESS_YEAR).delete()
+            except OperationalError as exc:
+                stats.record(error=exc)
+            else:
+                stats.record(time.perf_counter() - started)
+    finally:
+        connections.close_all()
+
+
+@skipUnless(connection.vendor == "sqlite", "The concurrency test targets SQLite's locking.")
+@skipIf(connection.is_in_memory_db(), "Needs a file-backed test database (DATABASES TEST NAME).")
+@override_settings(CACHES=TEST_CACHES)
+class SQLiteConcurrencyTests(TransactionTestCase):
+    readers = 8
+    seconds = 5.0
+    customer_count = 200
+
+    def setUp(self):
+        rng = random.Random(0)
+        lcm = User.objects.create(username="stress_lcm", role=User.Role.LCM)
+        cm = User.objects.create(username="stress_cm", role=User.Role.CM)
+        Customer.objects.bulk_create(
+            [
+                Customer(
+                    ile="STRESS{:04d}".format(index),
+                    round_location="R0",
+                    responsible_cm=cm,
+                    responsible_lcm=lcm,
+                )
+                for index in range(self.customer_count)
+            ]
+        )
+        self.customers = list(Customer.objects.select_related("responsible_lcm"))
+        CustomerStepRule.objects.bulk_create(
+            [
+                random_rule(rng, customer.pk, step_no)
+                for customer in self.customers
+                for step_no in range(1, 5)
+            ]
+        )
+        self.periods = [(2024, month) for month in range(1, 4)]
+        for period in self.periods:
+            bulk_ensure_work_for_month(*period, self.customers)
+
+    def test_readers_and_bulk_writer_never_hit_lock_errors(self):
+        # The connections in the threads below pick up SQLITE_PRAGMAS (WAL,
+        # busy_timeout) in configure_sqlite, like the web workers do.
+        connections.close_all()
+        stop = threading.Event()
+        read_stats = Stats()
+        write_stats = Stats()
+        threads = [
+            threading.Thread(target=reader, args=(stop, read_stats, self.periods))
+            for _ in range(self.readers)
+        ]
+        threads.append(threading.Thread(target=writer, args=(stop, write_stats, self.customers)))
+        for thread in threads:
+            thread.start()
+        time.sleep(self.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        summary = "reads: {}; writes: {}".format(read_stats.summary(), write_stats.summary())
+        self.assertEqual(read_stats.other_errors + write_stats.other_errors, [], summary)
+        self.assertEqual((read_stats.errors, write_stats.errors), (0, 0), summary)
+        self.assertTrue(read_stats.timings and write_stats.timings, summary)